@@ -0,0 +1,346 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+End to end benchmark of Step.push, Step.checkout, and Step.pull.
+
+Everything runs against throwaway resources: a git repo with a bare origin, a local
+staging directory, and by default an in-process S3 stand-in (moto) so no real bucket
+is ever touched. To benchmark against another S3 compatible stand-in (or a real
+bucket), provide it with `--bucket`.
+
+Example:
+    python benchmarks/bench_push_checkout.py --n-files 1000 --file-size 65536
+"""
+
+import argparse
+import contextlib
+import inspect
+import json
+import logging
+import os
+import sys
+import time
+import traceback
+from collections import defaultdict
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Callable, Dict, List, Tuple
+
+import git
+import pandas as pd
+import quilt3
+
+from datastep import Step, log_run_params, quilt_utils
+
+###############################################################################
+
+log = logging.getLogger()
+logging.basicConfig(
+    level=logging.INFO, format="[%(levelname)4s:%(lineno)4s %(asctime)s] %(message)s"
+)
+
+###############################################################################
+
+# The functions to time and the phase they are attributed to
+# Functions that don't exist in the installed quilt3 version are skipped
+PHASE_TARGETS = [
+    (Step, "_check_git_status_is_clean", "git checks"),
+    (Step, "_get_current_git_branch", "git checks"),
+    (Step, "_get_current_git_commit_hash", "git checks"),
+    (Step, "_get_git_origin_url", "git checks"),
+    (Step, "_create_data_commit_message", "git checks"),
+    (quilt_utils, "validate_manifest", "validation"),
+    (quilt_utils, "create_package", "packaging"),
+    (quilt_utils, "set_package_hashes", "hashing"),
+    (quilt3.Package, "browse", "browse"),
+    (quilt3.Package, "_fix_sha256", "hashing"),
+    (quilt3.Package, "build", "publish"),
+    (quilt3.packages, "copy_file_list", "transfer"),
+    (quilt3.data_transfer, "copy_file_list", "transfer"),
+]
+
+###############################################################################
+
+
+class Args(argparse.Namespace):
+    def __init__(self):
+        # Arguments that could be passed in through the command line
+        self.n_files = 100
+        self.file_size = 2 ** 16
+        self.bucket = None
+        self.output = None
+        self.debug = False
+        #
+        self.__parse()
+
+    def __parse(self):
+        p = argparse.ArgumentParser(
+            prog="bench_push_checkout",
+            description="Benchmark Step push, checkout, and pull end to end.",
+        )
+        p.add_argument(
+            "--n-files",
+            type=int,
+            default=self.n_files,
+            dest="n_files",
+            help="How many files the benchmark step produces.",
+        )
+        p.add_argument(
+            "--file-size",
+            type=int,
+            default=self.file_size,
+            dest="file_size",
+            help="The size in bytes of each file the benchmark step produces.",
+        )
+        p.add_argument(
+            "--bucket",
+            default=self.bucket,
+            dest="bucket",
+            help="An S3 compatible bucket to use instead of the in-process stand-in. "
+            "Ex: s3://my-benchmark-bucket",
+        )
+        p.add_argument(
+            "--output",
+            default=self.output,
+            dest="output",
+            help="Path to store the JSON report at.",
+        )
+        p.add_argument(
+            "--debug", action="store_true", dest="debug", help=argparse.SUPPRESS
+        )
+        p.parse_args(namespace=self)
+
+
+###############################################################################
+
+
+class BenchmarkStep(Step):
+    @log_run_params
+    def run(self, n_files: int = 100, file_size: int = 2 ** 16, **kwargs):
+        files_dir = self.step_local_staging_dir / "files"
+        files_dir.mkdir(parents=True, exist_ok=True)
+
+        manifest = []
+        for i in range(n_files):
+            f = files_dir / f"file_{i}.bin"
+            f.write_bytes(os.urandom(file_size))
+            manifest.append({"filepath": str(f), "index": i})
+
+        self.manifest = pd.DataFrame(manifest)
+        self.manifest.to_parquet(self.step_local_staging_dir / "manifest.parquet")
+
+
+class DownstreamStep(Step):
+    def __init__(self, **kwargs):
+        super().__init__(direct_upstream_tasks=[BenchmarkStep], **kwargs)
+
+
+###############################################################################
+
+
+class PhaseTimer:
+    def __init__(self, targets: List[Tuple[object, str, str]]):
+        self.targets = targets
+        self.durations = defaultdict(float)
+        self._depth = 0
+
+    def _wrap(self, func: Callable, phase: str) -> Callable:
+        def wrapper(*args, **kwargs):
+            # Only attribute time to the outermost timed call
+            self._depth += 1
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.durations[phase] += time.perf_counter() - start
+
+        return wrapper
+
+    @contextlib.contextmanager
+    def patch(self):
+        originals = []
+        for owner, name, phase in self.targets:
+            original = inspect.getattr_static(owner, name, None)
+            if original is None:
+                log.debug(f"Skipping timing of missing function: {owner}.{name}")
+                continue
+
+            # Preserve static and class methods
+            if isinstance(original, (staticmethod, classmethod)):
+                wrapped = type(original)(self._wrap(original.__func__, phase))
+            else:
+                wrapped = self._wrap(original, phase)
+
+            originals.append((owner, name, original))
+            setattr(owner, name, wrapped)
+
+        try:
+            yield self
+        finally:
+            for owner, name, original in reversed(originals):
+                setattr(owner, name, original)
+
+    def measure(self, operation: Callable) -> Dict[str, float]:
+        self.durations = defaultdict(float)
+        with self.patch():
+            start = time.perf_counter()
+            operation()
+            total = time.perf_counter() - start
+
+        # Anything not attributed to a phase is reported as other
+        phases = dict(self.durations)
+        phases["other"] = max(total - sum(phases.values()), 0.0)
+        return {"total": total, "phases": phases}
+
+
+@contextlib.contextmanager
+def mocked_s3(bucket: str):
+    # Supports both the moto < 5 and moto >= 5 APIs
+    try:
+        from moto import mock_aws as mock_s3
+    except ImportError:
+        from moto import mock_s3
+    import boto3
+
+    # moto requires credentials to be present, they are never used
+    for var in ["AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"]:
+        os.environ.setdefault(var, "benchmark")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+    with mock_s3():
+        boto3.client("s3").create_bucket(Bucket=bucket.replace("s3://", ""))
+        yield bucket
+
+
+def create_workspace(workspace: Path, bucket: str) -> Path:
+    # Create a bare origin and a working repo that tracks it
+    git.Repo.init(workspace / "origin.git", bare=True)
+    repo = git.Repo.init(workspace / "repo")
+    repo.git.symbolic_ref("HEAD", "refs/heads/master")
+
+    # The config is committed so the git status is clean for push
+    # The staging dir is outside of the repo for the same reason
+    with open(Path(repo.working_dir) / "workflow_config.json", "w") as write_out:
+        json.dump(
+            {
+                "quilt_storage_bucket": bucket,
+                "quilt_package_owner": "benchmark",
+                "quilt_package_name": "datastep_benchmark",
+                "project_local_staging_dir": str(workspace / "local_staging"),
+            },
+            write_out,
+        )
+    repo.index.add(["workflow_config.json"])
+    repo.index.commit("benchmark workspace")
+    repo.create_remote("origin", str(workspace / "origin.git"))
+    repo.remotes.origin.push("master")
+    repo.remotes.origin.fetch()
+
+    return Path(repo.working_dir)
+
+
+def run_benchmark(n_files: int, file_size: int, bucket: str, workspace: Path) -> Dict:
+    # Steps read the workflow config from the current working directory
+    os.chdir(create_workspace(workspace, bucket))
+
+    # Produce the step data
+    step = BenchmarkStep()
+    step.run(n_files=n_files, file_size=file_size)
+
+    # Time each operation
+    timer = PhaseTimer(PHASE_TARGETS)
+    report = {
+        "n_files": n_files,
+        "file_size": file_size,
+        "total_bytes": n_files * file_size,
+        "operations": {},
+    }
+
+    # Push validates while packaging, time standalone validation for comparison
+    report["operations"]["validate"] = timer.measure(
+        lambda: quilt_utils.validate_manifest(
+            step.manifest, step.filepath_columns, step.metadata_columns
+        )
+    )
+    report["operations"]["push"] = timer.measure(step.push)
+
+    step.clean()
+    report["operations"]["checkout"] = timer.measure(step.checkout)
+
+    step.clean()
+    report["operations"]["pull"] = timer.measure(DownstreamStep().pull)
+
+    # Throughput
+    for operation in report["operations"].values():
+        operation["files_per_second"] = n_files / operation["total"]
+        operation["mb_per_second"] = (
+            report["total_bytes"] / 2 ** 20 / operation["total"]
+        )
+
+    return report
+
+
+def print_report(report: Dict):
+    print(
+        f"\n{report['n_files']} files of {report['file_size']} bytes "
+        f"({report['total_bytes'] / 2 ** 20:.2f} MB)\n"
+    )
+    for name, operation in report["operations"].items():
+        print(
+            f"{name}: {operation['total']:.3f}s, "
+            f"{operation['files_per_second']:.1f} files/s, "
+            f"{operation['mb_per_second']:.2f} MB/s"
+        )
+        for phase, duration in sorted(
+            operation["phases"].items(), key=lambda item: -item[1]
+        ):
+            print(f"    {phase:<12} {duration:.3f}s")
+
+
+###############################################################################
+
+
+def main():
+    try:
+        args = Args()
+        dbg = args.debug
+
+        original_dir = Path().resolve()
+        with TemporaryDirectory() as tempdir:
+            try:
+                if args.bucket is None:
+                    with mocked_s3("s3://datastep-benchmark") as bucket:
+                        report = run_benchmark(
+                            args.n_files, args.file_size, bucket, Path(tempdir)
+                        )
+                else:
+                    report = run_benchmark(
+                        args.n_files, args.file_size, args.bucket, Path(tempdir)
+                    )
+            finally:
+                os.chdir(original_dir)
+
+        print_report(report)
+        if args.output is not None:
+            with open(args.output, "w") as write_out:
+                json.dump(report, write_out, indent=4)
+            log.info(f"Stored report at: {args.output}")
+
+    except Exception as e:
+        log.error("=============================================")
+        if dbg:
+            log.error("\n\n" + traceback.format_exc())
+            log.error("=============================================")
+        log.error("\n\n" + str(e) + "\n")
+        log.error("=============================================")
+        sys.exit(1)
+
+
+###############################################################################
+# Allow caller to directly run this module (usually in development scenarios)
+
+if __name__ == "__main__":
+    main()
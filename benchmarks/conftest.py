@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+from pathlib import Path
+from typing import List, NamedTuple
+
+import numpy as np
+import pandas as pd
+import pytest
+
+###############################################################################
+
+# Manifest row counts to benchmark
+# Defaults to the smallest size to keep local runs fast, the full suite can be run
+# with: DATASTEP_BENCHMARK_SIZES=10000,100000,1000000 make benchmark
+BENCHMARK_SIZES = [
+    int(size) for size in os.environ.get("DATASTEP_BENCHMARK_SIZES", "10000").split(",")
+]
+
+# How many manifest rows reference the same file on average
+ROWS_PER_FILE = 10
+
+# How many metadata columns of each type to generate
+N_METADATA_COLUMNS_PER_TYPE = 8
+
+###############################################################################
+
+
+class SyntheticStep(NamedTuple):
+    staging_dir: Path
+    manifest: pd.DataFrame
+    relative_manifest: pd.DataFrame
+    filepath_columns: List[str]
+    metadata_columns: List[str]
+
+
+def _create_synthetic_step(staging_dir: Path, n_rows: int) -> SyntheticStep:
+    rng = np.random.RandomState(seed=42)
+
+    # Create the files, spread across sub-directories to keep directories small
+    n_files = max(n_rows // ROWS_PER_FILE, 1)
+    files = []
+    for i in range(n_files):
+        f = staging_dir / "files" / f"{i // 1000:04d}" / f"file_{i}.txt"
+        f.parent.mkdir(parents=True, exist_ok=True)
+        f.write_text(str(i))
+        files.append(str(f))
+
+    # Many rows reference the same file, like a cell manifest referencing FOVs
+    file_indices = rng.randint(0, n_files, size=n_rows)
+    manifest = pd.DataFrame({"filepath": np.array(files)[file_indices]})
+
+    # Wide metadata of the common types
+    metadata_columns = []
+    for i in range(N_METADATA_COLUMNS_PER_TYPE):
+        manifest[f"int_{i}"] = rng.randint(0, 1000, size=n_rows)
+        manifest[f"float_{i}"] = rng.random_sample(size=n_rows)
+        manifest[f"str_{i}"] = [f"value_{v}" for v in rng.randint(0, 100, n_rows)]
+        manifest[f"file_constant_{i}"] = file_indices
+        metadata_columns += [
+            f"int_{i}",
+            f"float_{i}",
+            f"str_{i}",
+            f"file_constant_{i}",
+        ]
+
+    return SyntheticStep(
+        staging_dir=staging_dir,
+        manifest=manifest,
+        relative_manifest=manifest.assign(
+            filepath=[str(Path(f).relative_to(staging_dir)) for f in manifest.filepath]
+        ),
+        filepath_columns=["filepath"],
+        metadata_columns=metadata_columns,
+    )
+
+
+@pytest.fixture(scope="session", params=BENCHMARK_SIZES, ids=lambda n: f"{n}rows")
+def synthetic_step(request, tmp_path_factory) -> SyntheticStep:
+    staging_dir = tmp_path_factory.mktemp(f"staging_{request.param}").resolve()
+    return _create_synthetic_step(staging_dir, request.param)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+
+from datastep import file_utils, quilt_utils
+
+from .utils import record_peak_memory
+
+###############################################################################
+
+# Large manifests take minutes per call, a single round is representative
+PEDANTIC_KWARGS = {"rounds": 1, "iterations": 1, "warmup_rounds": 0}
+
+###############################################################################
+
+
+def test_validate_manifest(benchmark, synthetic_step):
+    args = (
+        synthetic_step.manifest,
+        synthetic_step.filepath_columns,
+        synthetic_step.metadata_columns,
+    )
+    benchmark.pedantic(quilt_utils.validate_manifest, args=args, **PEDANTIC_KWARGS)
+    record_peak_memory(benchmark, quilt_utils.validate_manifest, *args)
+
+
+def test_create_package(benchmark, synthetic_step):
+    kwargs = {
+        "manifest": synthetic_step.manifest,
+        "step_pkg_root": synthetic_step.staging_dir,
+        "filepath_columns": synthetic_step.filepath_columns,
+        "metadata_columns": synthetic_step.metadata_columns,
+    }
+    benchmark.pedantic(quilt_utils.create_package, kwargs=kwargs, **PEDANTIC_KWARGS)
+    record_peak_memory(benchmark, quilt_utils.create_package, **kwargs)
+
+
+def test_manifest_filepaths_rel2abs(benchmark, synthetic_step):
+    args = (
+        synthetic_step.relative_manifest,
+        synthetic_step.filepath_columns,
+        synthetic_step.staging_dir,
+    )
+    benchmark.pedantic(
+        file_utils.manifest_filepaths_rel2abs, args=args, **PEDANTIC_KWARGS
+    )
+    record_peak_memory(benchmark, file_utils.manifest_filepaths_rel2abs, *args)
+
+
+def test_manifest_filepaths_abs2rel(benchmark, synthetic_step):
+    args = (
+        synthetic_step.manifest,
+        synthetic_step.filepath_columns,
+        synthetic_step.staging_dir,
+    )
+    benchmark.pedantic(
+        file_utils.manifest_filepaths_abs2rel, args=args, **PEDANTIC_KWARGS
+    )
+    record_peak_memory(benchmark, file_utils.manifest_filepaths_abs2rel, *args)
+
+
+def test_manifest_write_parquet(benchmark, synthetic_step, tmp_path):
+    m_path = tmp_path / "manifest.parquet"
+    benchmark.pedantic(
+        synthetic_step.manifest.to_parquet, args=(m_path,), **PEDANTIC_KWARGS
+    )
+    record_peak_memory(benchmark, synthetic_step.manifest.to_parquet, m_path)
+
+
+def test_manifest_read_parquet(benchmark, synthetic_step, tmp_path):
+    m_path = tmp_path / "manifest.parquet"
+    synthetic_step.manifest.to_parquet(m_path)
+    benchmark.pedantic(pd.read_parquet, args=(m_path,), **PEDANTIC_KWARGS)
+    record_peak_memory(benchmark, pd.read_parquet, m_path)
+
+
+def test_manifest_write_csv(benchmark, synthetic_step, tmp_path):
+    m_path = tmp_path / "manifest.csv"
+    kwargs = {"path_or_buf": m_path, "index": False}
+    benchmark.pedantic(synthetic_step.manifest.to_csv, kwargs=kwargs, **PEDANTIC_KWARGS)
+    record_peak_memory(benchmark, synthetic_step.manifest.to_csv, **kwargs)
+
+
+def test_manifest_read_csv(benchmark, synthetic_step, tmp_path):
+    m_path = tmp_path / "manifest.csv"
+    synthetic_step.manifest.to_csv(m_path, index=False)
+    benchmark.pedantic(pd.read_csv, args=(m_path,), **PEDANTIC_KWARGS)
+    record_peak_memory(benchmark, pd.read_csv, m_path)
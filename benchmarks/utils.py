@@ -0,0 +1,20 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import tracemalloc
+from typing import Any, Callable
+
+###############################################################################
+
+
+def record_peak_memory(benchmark, func: Callable, *args, **kwargs) -> Any:
+    # Run once more outside of timing to find the peak memory allocated by the func
+    tracemalloc.start()
+    try:
+        result = func(*args, **kwargs)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    benchmark.extra_info["peak_memory_mb"] = round(peak / 2 ** 20, 2)
+    return result
@@ -2,6 +2,8 @@
 
 """Top-level package for datastep."""
 
+import sys
+
 __author__ = "Jackson Maxfield Brown"
 __email__ = "jacksonb@alleninstitute.org"
 # Do not edit this string manually, always use bumpversion
@@ -13,4 +15,21 @@ def get_module_version():
     return __version__
 
 
-from .step import Step, log_run_params  # noqa: F401
+# Step pulls in prefect (and the rest of the heavy dependencies on use), only import
+# it when it is first accessed so that `import datastep` stays fast
+if sys.version_info >= (3, 7):
+
+    def __getattr__(name):
+        if name in ["Step", "log_run_params", "push_all"]:
+            from . import step
+
+            return getattr(step, name)
+
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+    def __dir__():
+        return sorted(list(globals()) + ["Step", "log_run_params", "push_all"])
+
+
+else:
+    from .step import Step, log_run_params, push_all  # noqa: F401
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+###############################################################################
+
+log = logging.getLogger(__name__)
+
+###############################################################################
+
+# Where bundles are stored relative to the step package root
+BUNDLE_DIR = "__bundles__"
+BUNDLE_INDEX = f"{BUNDLE_DIR}/index.json"
+
+# The target size of each bundle shard
+DEFAULT_SHARD_SIZE = 2 ** 28
+
+###############################################################################
+
+
+class BundleMember(NamedTuple):
+    logical_key: str
+    filepath: Path
+    size: int
+    meta: Dict[str, Any]
+
+
+def create_bundles(
+    members: List[BundleMember],
+    dirpath: Path,
+    shard_size: int = DEFAULT_SHARD_SIZE,
+) -> Dict[str, Any]:
+    # Concatenate the members into shard files and record where each one starts so
+    # a single member can be read back with one seek
+    #
+    # Ex:
+    # {
+    #     "shards": ["bundle-000000.bin"],
+    #     "members": {
+    #         "cells/0.json": {
+    #             "shard": "bundle-000000.bin", "offset": 0, "size": 120, "meta": {}
+    #         },
+    #     },
+    # }
+    bundle_dir = dirpath / BUNDLE_DIR
+    bundle_dir.mkdir(parents=True, exist_ok=True)
+
+    shards = []
+    index = {}
+    write_out = None
+    offset = 0
+    try:
+        for member in members:
+            # Start a new shard once the current one is full
+            if write_out is None or offset >= shard_size:
+                if write_out is not None:
+                    write_out.close()
+                shards.append(f"bundle-{len(shards):06d}.bin")
+                write_out = open(bundle_dir / shards[-1], "wb")
+                offset = 0
+
+            with open(member.filepath, "rb") as read_in:
+                data = read_in.read()
+            write_out.write(data)
+
+            index[member.logical_key] = {
+                "shard": shards[-1],
+                "offset": offset,
+                "size": len(data),
+                "meta": member.meta,
+            }
+            offset += len(data)
+    finally:
+        if write_out is not None:
+            write_out.close()
+
+    bundle_index = {"shards": shards, "members": index}
+    with open(dirpath / BUNDLE_INDEX, "w") as write_index:
+        json.dump(bundle_index, write_index)
+
+    log.debug(f"Bundled {len(members)} files into {len(shards)} shards")
+    return bundle_index
+
+
+def _unbundle_shard(
+    dirpath: Path,
+    shard: str,
+    members: List[Tuple[str, Dict[str, Any]]],
+    bundle_dir: Path,
+):
+    # Members are read in offset order so the shard is read sequentially
+    with open(bundle_dir / shard, "rb") as read_in:
+        for logical_key, details in sorted(members, key=lambda m: m[1]["offset"]):
+            read_in.seek(details["offset"])
+            data = read_in.read(details["size"])
+
+            target = dirpath / logical_key
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with open(target, "wb") as write_out:
+                write_out.write(data)
+
+
+def unbundle(
+    dirpath: Path, remove: bool = True, n_workers: Optional[int] = None
+) -> int:
+    # Nothing to do if the package wasn't bundled
+    index_path = dirpath / BUNDLE_INDEX
+    if not index_path.is_file():
+        return 0
+
+    with open(index_path, "r") as read_in:
+        bundle_index = json.load(read_in)
+
+    # Group members by shard so each shard is opened once
+    by_shard = {shard: [] for shard in bundle_index["shards"]}
+    for logical_key, details in bundle_index["members"].items():
+        by_shard[details["shard"]].append((logical_key, details))
+
+    # Shards are independent of each other
+    bundle_dir = dirpath / BUNDLE_DIR
+    with ThreadPoolExecutor(max_workers=n_workers) as exe:
+        futures = [
+            exe.submit(_unbundle_shard, dirpath, shard, members, bundle_dir)
+            for shard, members in by_shard.items()
+        ]
+        for future in futures:
+            future.result()
+
+    # The shards aren't needed once their members are restored
+    if remove:
+        for shard in bundle_index["shards"]:
+            os.remove(bundle_dir / shard)
+        os.remove(index_path)
+        if len(os.listdir(bundle_dir)) == 0:
+            os.rmdir(bundle_dir)
+
+    log.debug(f"Unbundled {len(bundle_index['members'])} files in: {dirpath}")
+    return len(bundle_index["members"])
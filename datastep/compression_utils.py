@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+###############################################################################
+
+log = logging.getLogger(__name__)
+
+###############################################################################
+
+# The only supported codec, stored on package entries under the metadata key
+CODEC = "zstd"
+CODEC_META_KEY = "datastep_compression"
+
+DEFAULT_COMPRESSION_LEVEL = 3
+
+###############################################################################
+
+
+def _import_zstandard():
+    # zstandard is an optional dependency, only required when compressing
+    try:
+        import zstandard
+
+        return zstandard
+    except ImportError:
+        raise ImportError(
+            "Compressing step files requires the zstandard package. "
+            "Install it with: pip install datastep[compression]"
+        )
+
+
+def compress_file(
+    source: Path, target: Path, level: int = DEFAULT_COMPRESSION_LEVEL
+) -> Path:
+    zstandard = _import_zstandard()
+
+    # Stream so memory stays flat for large files
+    target.parent.mkdir(parents=True, exist_ok=True)
+    compressor = zstandard.ZstdCompressor(level=level)
+    with open(source, "rb") as read_in, open(target, "wb") as write_out:
+        compressor.copy_stream(read_in, write_out)
+
+    return target
+
+
+def decompress_file(source: Path, target: Optional[Path] = None) -> Path:
+    zstandard = _import_zstandard()
+
+    # Decompress in place by default
+    # Write to a temporary file and rename so the target is either complete or absent
+    if target is None:
+        target = source
+    tmp_path = target.parent / f".{target.name}.decompress.tmp"
+    decompressor = zstandard.ZstdDecompressor()
+    with open(source, "rb") as read_in, open(tmp_path, "wb") as write_out:
+        decompressor.copy_stream(read_in, write_out)
+    os.replace(tmp_path, target)
+
+    return target
+
+
+def compress_files(
+    files: List[Tuple[Path, Path]],
+    level: int = DEFAULT_COMPRESSION_LEVEL,
+    n_workers: Optional[int] = None,
+) -> List[Path]:
+    # zstandard releases the GIL while compressing so threads scale with cores
+    with ThreadPoolExecutor(max_workers=n_workers) as exe:
+        futures = [
+            exe.submit(compress_file, source, target, level) for source, target in files
+        ]
+        return [future.result() for future in futures]
+
+
+def decompress_files(files: List[Path], n_workers: Optional[int] = None) -> List[Path]:
+    with ThreadPoolExecutor(max_workers=n_workers) as exe:
+        futures = [exe.submit(decompress_file, f) for f in files]
+        return [future.result() for future in futures]
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-from jinja2 import Template
+import sys
 
 ###############################################################################
 
@@ -15,13 +15,33 @@ DEFAULT_PROJECT_LOCAL_STAGING_DIR = "{cwd}/local_staging"
 DEFAULT_STEP_LOCAL_STAGING_DIR = "/".join(
     [DEFAULT_PROJECT_LOCAL_STAGING_DIR, "{module_name}"]
 )
+DEFAULT_BACKGROUND_CLEAN = False
+DEFAULT_PUSH_ATTEMPTS = 5
+
+# Files and directories in a step local staging dir that are managed by datastep
+# These are never removed when only cleaning files not referenced by the manifest
+STEP_LOCAL_STAGING_PROTECTED_FILES = [
+    "init_parameters.json",
+    "run_parameters.json",
+    "run_stats.json",
+    "run_memo.json",
+    "run_result.json",
+    "run_profile.prof",
+    "run_profile.txt",
+    "run_profile.html",
+    "timings.json",
+    "manifest.parquet",
+    "manifest.csv",
+    "manifest_index.json",
+    "manifest_parts",
+]
 
 ###############################################################################
 
 
 # This is decently GitHub centric...
-README_TEMPLATE = Template(
-    """# {{ quilt_package_name }}
+# The raw Jinja source, README_TEMPLATE is compiled from it on first access
+README_TEMPLATE_SOURCE = """# {{ quilt_package_name }}
 
 [Project Repo]({{ source_url }})
 
@@ -30,5 +50,30 @@ README_TEMPLATE = Template(
 [Code Changes for Commit: {{ commit_hash }}]({{ source_url }}/commit/{{ commit_hash }})
 
 Version Generated by: {{ creator }}
-"""
-)  # noqa: F501
+"""  # noqa: F501
+
+# Compiling the template requires jinja2, only do so when it is first accessed so
+# that importing constants stays fast
+if sys.version_info >= (3, 7):
+    _readme_template = None
+
+    def __getattr__(name):
+        global _readme_template
+        if name == "README_TEMPLATE":
+            if _readme_template is None:
+                from jinja2 import Template
+
+                _readme_template = Template(README_TEMPLATE_SOURCE)
+
+            return _readme_template
+
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+    def __dir__():
+        return sorted(list(globals()) + ["README_TEMPLATE"])
+
+
+else:
+    from jinja2 import Template
+
+    README_TEMPLATE = Template(README_TEMPLATE_SOURCE)
@@ -4,11 +4,27 @@
 import hashlib
 import json
 import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 from shutil import rmtree
-from typing import Any, Dict, List, Optional, Union
-
-import pandas as pd
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 ###############################################################################
 
@@ -16,6 +32,12 @@ log = logging.getLogger(__name__)
 
 ###############################################################################
 
+# Tombstones currently being removed by a background clean of this process
+_claimed_tombstones: Set[str] = set()
+_claimed_tombstones_lock = threading.Lock()
+
+###############################################################################
+
 
 def resolve_filepath(f: Union[str, Path], strict: bool = True) -> Path:
     # Resolve
@@ -71,6 +93,37 @@ def create_unique_logical_key(physical_key: Union[str, Path]) -> str:
     return f"{short_hash}_{pk.name}"
 
 
+def hash_file(f: Union[str, Path], chunk_size: int = 2 ** 20) -> str:
+    # Read in chunks to keep memory flat for large files
+    # Reading into a single reused buffer avoids allocating a new bytes object per
+    # chunk, the buffer is never larger than the file so small files stay cheap
+    sha256 = hashlib.sha256()
+    with open(f, "rb", buffering=0) as read_in:
+        size = os.fstat(read_in.fileno()).st_size
+        buffer = memoryview(bytearray(max(min(chunk_size, size), 1)))
+        while True:
+            n_read = read_in.readinto(buffer)
+            if not n_read:
+                break
+            sha256.update(buffer[:n_read])
+
+    return sha256.hexdigest()
+
+
+def hash_files(
+    files: Iterable[Union[str, Path]],
+    n_workers: Optional[int] = None,
+    chunk_size: int = 2 ** 23,
+) -> Dict[str, str]:
+    # hashlib releases the GIL while hashing large buffers so threads scale with
+    # the available cores and disk bandwidth without any pickling overhead
+    # Each unique file is only hashed once
+    files = list(dict.fromkeys(str(f) for f in files))
+    with ThreadPoolExecutor(max_workers=n_workers) as exe:
+        hashes = exe.map(partial(hash_file, chunk_size=chunk_size), files)
+        return dict(zip(files, hashes))
+
+
 def make_json_serializable(
     value: Any, context: Optional[str] = None
 ) -> Union[bool, float, int, str, List, Dict]:
@@ -95,7 +148,7 @@ def _filepath_abs2rel(filepath: Path, otherpath: Path = Path(".")) -> Path:
 
 
 def manifest_filepaths_rel2abs(
-    manifest: pd.DataFrame, filepath_columns: List[str], relative_dir: Path
+    manifest: "pd.DataFrame", filepath_columns: List[str], relative_dir: Path
 ):
     # Make a copy of the manifest
     manifest = manifest.copy(deep=True)
@@ -110,7 +163,7 @@ def manifest_filepaths_rel2abs(
 
 
 def manifest_filepaths_abs2rel(
-    manifest: pd.DataFrame, filepath_columns: List[str], relative_dir: Path
+    manifest: "pd.DataFrame", filepath_columns: List[str], relative_dir: Path
 ):
     # Make a copy of the manifest
     manifest = manifest.copy(deep=True)
@@ -124,13 +177,122 @@ def manifest_filepaths_abs2rel(
     return manifest
 
 
-def _clean(dirpath: Path) -> Optional[Exception]:
-    # Remove anything in step staging dir
-    rmtree(dirpath)
-
-    # Create it again as empty dir
+def _remove_tree(dirpath: Path, n_workers: Optional[int] = None):
+    # Serial removal
+    if n_workers is None or n_workers <= 1:
+        rmtree(dirpath)
+        return
+
+    # Remove each top level child in parallel, helps most on network storage
+    def _remove_child(child: Path):
+        if child.is_dir() and not child.is_symlink():
+            rmtree(child)
+        else:
+            child.unlink()
+
+    with ThreadPoolExecutor(max_workers=n_workers) as exe:
+        list(exe.map(_remove_child, dirpath.iterdir()))
+    dirpath.rmdir()
+
+
+def _remove_tombstones(tombstones: List[Path], n_workers: Optional[int] = None):
+    # Another process may be removing the same tombstone, a failure to remove one
+    # must not abandon the rest
+    for tombstone in tombstones:
+        try:
+            _remove_tree(tombstone, n_workers)
+        except OSError as e:
+            log.warning(f"Failed to remove clean tombstone: {tombstone}. Error: {e}")
+        finally:
+            with _claimed_tombstones_lock:
+                _claimed_tombstones.discard(str(tombstone))
+
+
+def _clean(
+    dirpath: Path, background: bool = False, n_workers: Optional[int] = None
+) -> Optional[threading.Thread]:
+    if not background:
+        # Remove anything in step staging dir
+        _remove_tree(dirpath, n_workers)
+
+        # Create it again as empty dir
+        dirpath.mkdir(parents=True, exist_ok=True)
+        return None
+
+    # Move the directory out of the way to a tombstone next to it
+    # A rename within the same parent is atomic and instant regardless of size
+    tombstone = dirpath.with_name(f".{dirpath.name}.tombstone-{uuid.uuid4().hex}")
+    dirpath.rename(tombstone)
+
+    # Create it again as empty dir, ready to be written to immediately
     dirpath.mkdir(parents=True, exist_ok=True)
 
+    # Remove the tombstone and any left behind by interrupted cleans
+    # Tombstones an earlier background clean is still removing are left to it
+    # The thread isn't a daemon so the process waits for removal prior to exit
+    with _claimed_tombstones_lock:
+        tombstones = [
+            t
+            for t in dirpath.parent.glob(f".{dirpath.name}.tombstone-*")
+            if str(t) not in _claimed_tombstones
+        ]
+        _claimed_tombstones.update(str(t) for t in tombstones)
+
+    thread = threading.Thread(
+        target=_remove_tombstones,
+        args=(tombstones, n_workers),
+        name=f"clean-{dirpath.name}",
+    )
+    thread.start()
+    log.debug(f"Removing {tombstones} in background thread: {thread.name}")
+
+    return thread
+
+
+def _remove_unreferenced(
+    dirpath: Path,
+    referenced: Iterable[Union[str, Path]],
+    protected: Iterable[str] = [],
+    dry_run: bool = False,
+) -> Tuple[int, int]:
+    # Build the full set of kept paths up front so the walk only does set lookups
+    # Referenced (or protected) directories keep everything inside of them
+    # Relative references are relative to the current working directory, the same
+    # resolution used when the package is created
+    # Both the link and its target are kept so symlinks are never removed
+    dirpath = dirpath.resolve()
+    keep = set()
+    for f in referenced:
+        f = Path(f).expanduser().absolute()
+        keep.add(str(f.parent.resolve() / f.name))
+        keep.add(str(f.resolve()))
+    keep.update(str(dirpath / name) for name in protected)
+
+    files_removed = 0
+    bytes_reclaimed = 0
+    visited = []
+    for root, dirs, files in os.walk(dirpath):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) not in keep]
+        visited.append(root)
+
+        for name in files:
+            f = os.path.join(root, name)
+            if f in keep:
+                continue
+
+            bytes_reclaimed += os.lstat(f).st_size
+            files_removed += 1
+            if not dry_run:
+                os.remove(f)
+
+    # Remove directories left empty, deepest first
+    if not dry_run:
+        for root in reversed(visited[1:]):
+            if len(os.listdir(root)) == 0:
+                os.rmdir(root)
+
+    return files_removed, bytes_reclaimed
+
 
 def _sanitize_name(input_str: str):
     return input_str.replace(" ", "_")
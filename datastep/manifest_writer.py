@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import os
+import re
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Union,
+)
+
+from . import file_utils
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+###############################################################################
+
+log = logging.getLogger(__name__)
+
+###############################################################################
+
+
+class ManifestWriter:
+    """
+    An append-only manifest that spills rows to disk as it goes.
+
+    Rows are buffered in memory and, once the buffer is full, written out as a new
+    Parquet part file in the parts directory. Part files are written to a temporary
+    name and atomically renamed, so a crash mid-run never leaves a partial part
+    behind and every row that was flushed before the crash can still be read.
+
+    Rows can optionally be tagged with the unit of work that produced them. Units
+    are recorded as completed in the same flush that stores their rows, which allows
+    a resumed run to skip any unit that was completed before a crash.
+
+    Parameters
+    ----------
+    dirpath: Union[str, Path]
+        The directory to store the manifest part files in.
+    buffer_size: int
+        How many rows to hold in memory before spilling them to a new part file.
+        Default: 1000
+    """
+
+    def __init__(self, dirpath: Union[str, Path], buffer_size: int = 1000):
+        self.dirpath = Path(dirpath)
+        self.buffer_size = buffer_size
+        self._buffer = []
+        self._pending_units = []
+        self._n_parts = self._find_next_part_number()
+        self._completed_units = self._read_completed_units()
+
+    def _find_next_part_number(self) -> int:
+        if not self.dirpath.is_dir():
+            return 0
+
+        # Part numbers are shared by part files and units files
+        numbers = [
+            int(match.group(1))
+            for match in (
+                re.match(r"part-(\d+)\.", f.name) for f in self.dirpath.iterdir()
+            )
+            if match is not None
+        ]
+        return max(numbers, default=-1) + 1
+
+    def _read_completed_units(self) -> Set[str]:
+        if not self.dirpath.is_dir():
+            return set()
+
+        completed_units = set()
+        for units_path in sorted(self.dirpath.glob("part-*.units.json")):
+            with open(units_path, "r") as read_in:
+                record = json.load(read_in)
+
+            # Units are written prior to their rows, only trust the units if the part
+            # storing their rows made it to disk
+            if record["part"] is None or (self.dirpath / record["part"]).is_file():
+                completed_units.update(record["units"])
+            else:
+                log.debug(f"Ignoring units with missing part: {units_path}")
+
+        return completed_units
+
+    @property
+    def parts(self) -> List[Path]:
+        """
+        The part files currently stored on disk, in write order.
+        """
+        if not self.dirpath.is_dir():
+            return []
+
+        return sorted(self.dirpath.glob("part-*.parquet"))
+
+    @property
+    def completed_units(self) -> Set[str]:
+        """
+        The units of work whose rows have been stored on disk.
+        """
+        return set(self._completed_units)
+
+    def is_complete(self, unit: str) -> bool:
+        """
+        Check if a unit of work has already been completed and stored.
+
+        Parameters
+        ----------
+        unit: str
+            The unit of work identifier.
+        """
+        return unit in self._completed_units
+
+    def append(self, row: Dict[str, Any], unit: Optional[str] = None):
+        """
+        Add a single row to the manifest.
+
+        Parameters
+        ----------
+        row: Dict[str, Any]
+            The column to value mapping for the row.
+        unit: Optional[str]
+            An identifier for the unit of work that produced this row. If provided,
+            the unit is marked as complete once the row is stored.
+        """
+        self.extend([row], unit=unit)
+
+    def extend(
+        self,
+        rows: Union["pd.DataFrame", List[Dict[str, Any]]],
+        unit: Optional[str] = None,
+    ):
+        """
+        Add a batch of rows to the manifest.
+
+        Parameters
+        ----------
+        rows: Union[pd.DataFrame, List[Dict[str, Any]]]
+            A dataframe or list of column to value mappings.
+        unit: Optional[str]
+            An identifier for the unit of work that produced these rows. If provided,
+            the unit is marked as complete once the rows are stored.
+        """
+        import pandas as pd
+
+        if isinstance(rows, pd.DataFrame):
+            rows = rows.to_dict("records")
+
+        # Paths aren't storable in Parquet, cast them to strings
+        # The entire batch is buffered before a flush so that a unit's rows are always
+        # stored in a single part
+        for row in rows:
+            self._buffer.append(
+                {k: str(v) if isinstance(v, Path) else v for k, v in row.items()}
+            )
+
+        if unit is not None:
+            self._pending_units.append(str(unit))
+
+        # Spill to disk once the buffer is full
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def complete(self, unit: str):
+        """
+        Mark a unit of work that didn't produce any rows as complete.
+
+        Parameters
+        ----------
+        unit: str
+            The unit of work identifier.
+        """
+        self.extend([], unit=unit)
+
+    def process_units(
+        self,
+        func: Callable[[Any], Optional[Union["pd.DataFrame", List[Dict[str, Any]]]]],
+        units: Iterable[Any],
+    ):
+        """
+        Run a function over units of work and store the rows each unit produces,
+        skipping any unit completed by a prior run.
+
+        Parameters
+        ----------
+        func: Callable[[Any], Optional[Union[pd.DataFrame, List[Dict[str, Any]]]]]
+            Called with each unit that hasn't been completed, returns the rows the
+            unit produced (or None if it produced none).
+        units: Iterable[Any]
+            The units of work. Each unit is identified by its string form.
+        """
+        n_skipped = 0
+        for unit in units:
+            if self.is_complete(str(unit)):
+                n_skipped += 1
+                continue
+
+            rows = func(unit)
+            if rows is None:
+                # Nothing would trigger a flush of a unit without rows, store it now
+                # rather than redoing it after a crash
+                self.complete(str(unit))
+                if len(self._buffer) == 0:
+                    self.flush()
+            else:
+                self.extend(rows, unit=str(unit))
+
+        if n_skipped > 0:
+            log.info(f"Skipped {n_skipped} units completed by a prior run.")
+
+        self.flush()
+
+    def flush(self):
+        """
+        Write any buffered rows out to a new part file.
+        """
+        if len(self._buffer) == 0 and len(self._pending_units) == 0:
+            return
+
+        self.dirpath.mkdir(parents=True, exist_ok=True)
+        part_path = self.dirpath / f"part-{self._n_parts:06d}.parquet"
+
+        # Write the units first, they are only trusted on read if the part exists
+        if len(self._pending_units) > 0:
+            units_path = self.dirpath / f"part-{self._n_parts:06d}.units.json"
+            tmp_path = self.dirpath / f".{units_path.name}.tmp"
+            with open(tmp_path, "w") as write_out:
+                json.dump(
+                    {
+                        "part": part_path.name if len(self._buffer) > 0 else None,
+                        "units": self._pending_units,
+                    },
+                    write_out,
+                )
+            os.replace(tmp_path, units_path)
+
+        # Write to a temporary file and rename so a part is either complete or absent
+        if len(self._buffer) > 0:
+            import pandas as pd
+
+            tmp_path = self.dirpath / f".{part_path.name}.tmp"
+            pd.DataFrame(self._buffer).to_parquet(tmp_path)
+            os.replace(tmp_path, part_path)
+            log.debug(f"Wrote {len(self._buffer)} manifest rows to: {part_path}")
+
+        # Reset buffer
+        self._completed_units.update(self._pending_units)
+        self._n_parts += 1
+        self._buffer = []
+        self._pending_units = []
+
+    def read(self) -> Optional["pd.DataFrame"]:
+        """
+        Assemble the full manifest from every part file and any buffered rows.
+
+        Returns
+        -------
+        manifest: Optional[pd.DataFrame]
+            The assembled manifest or None if no rows have been written.
+        """
+        self.flush()
+
+        parts = self.parts
+        if len(parts) == 0:
+            return None
+
+        import pandas as pd
+
+        return pd.concat(
+            [pd.read_parquet(part) for part in parts], ignore_index=True, sort=False
+        )
+
+    def reset(self):
+        """
+        Drop all buffered rows and remove every part file.
+        """
+        self._buffer = []
+        self._pending_units = []
+        if self.dirpath.is_dir():
+            file_utils._clean(self.dirpath)
+        self._n_parts = 0
+        self._completed_units = set()
@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+###############################################################################
+
+log = logging.getLogger(__name__)
+
+###############################################################################
+
+# Callables that receive every completed operation and phase record
+_hooks: List[Callable[[Dict[str, Any]], None]] = []
+
+# Each thread tracks its own stack of open records
+_local = threading.local()
+
+###############################################################################
+
+
+def register_hook(hook: Callable[[Dict[str, Any]], None]):
+    """
+    Register a callable to receive every completed operation and phase record.
+
+    Records are dictionaries with the following keys: "type" ("operation" or
+    "phase"), "name", "start" (UNIX timestamp), "wall_time" (seconds), "peak_rss"
+    (bytes or None if unavailable), "phases" (the nested phase records), and any extra
+    fields such as "files" or "bytes" that were recorded.
+
+    Parameters
+    ----------
+    hook: Callable[[Dict[str, Any]], None]
+        The callable to send records to. Ex: a function that converts records to
+        spans for a tracing system.
+    """
+    _hooks.append(hook)
+
+
+def remove_hook(hook: Callable[[Dict[str, Any]], None]):
+    """
+    Stop sending records to a previously registered hook.
+    """
+    _hooks.remove(hook)
+
+
+def get_peak_rss() -> Optional[int]:
+    # The resource module is unavailable on Windows
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    # Linux reports kilobytes while macOS reports bytes
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return peak
+
+    return peak * 1024
+
+
+def get_io_counters() -> Optional[Dict[str, int]]:
+    # Prefer psutil when it is installed as it is available on every platform
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+
+    if psutil is not None:
+        # io_counters doesn't exist on macOS
+        try:
+            counters = psutil.Process().io_counters()
+        except (AttributeError, psutil.Error):
+            return None
+
+        return {
+            "bytes_read": counters.read_bytes,
+            "bytes_written": counters.write_bytes,
+        }
+
+    # Fall back to the Linux proc filesystem
+    proc_io = Path("/proc/self/io")
+    if not proc_io.is_file():
+        return None
+
+    with open(proc_io, "r") as read_in:
+        counters = dict(line.split(": ") for line in read_in.read().splitlines())
+    return {
+        "bytes_read": int(counters["read_bytes"]),
+        "bytes_written": int(counters["write_bytes"]),
+    }
+
+
+def sample_resources() -> Dict[str, Any]:
+    # CPU time includes any child processes that have been waited on
+    times = os.times()
+    return {
+        "wall_time": time.perf_counter(),
+        "cpu_time": (
+            times.user + times.system + times.children_user + times.children_system
+        ),
+        "io": get_io_counters(),
+    }
+
+
+def get_resource_usage(start: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Get the resources used since a prior sample.
+
+    Parameters
+    ----------
+    start: Dict[str, Any]
+        A prior sample produced by `sample_resources`.
+
+    Returns
+    -------
+    usage: Dict[str, Any]
+        The wall time and CPU time in seconds, the bytes read and written (None if
+        unavailable), and the peak resident set size of the process in bytes (None if
+        unavailable). Peak RSS is the peak for the life of the process, not only since
+        the prior sample.
+    """
+    end = sample_resources()
+    usage = {
+        "wall_time": end["wall_time"] - start["wall_time"],
+        "cpu_time": end["cpu_time"] - start["cpu_time"],
+        "bytes_read": None,
+        "bytes_written": None,
+        "peak_rss": get_peak_rss(),
+    }
+    if start["io"] is not None and end["io"] is not None:
+        for counter in ["bytes_read", "bytes_written"]:
+            usage[counter] = end["io"][counter] - start["io"][counter]
+
+    return usage
+
+
+def _get_stack() -> List[Dict[str, Any]]:
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+
+    return _local.stack
+
+
+def emit(record: Dict[str, Any]):
+    """
+    Send a record to every registered hook.
+
+    Hooks that fail are logged and skipped so a broken hook never fails the
+    operation being measured.
+
+    Parameters
+    ----------
+    record: Dict[str, Any]
+        The record to send. Ex: {"type": "progress", "name": "Fetch", "n": 10}
+    """
+    for hook in _hooks:
+        try:
+            hook(record)
+        except Exception as e:
+            log.warning(f"Metrics hook {hook} failed with: {e}")
+
+
+@contextmanager
+def _record(record_type: str, name: str, **fields) -> Iterator[Dict[str, Any]]:
+    record = {
+        "type": record_type,
+        "name": name,
+        "start": time.time(),
+        **fields,
+        "phases": [],
+    }
+
+    # Attach to the currently open record (if any) so records form a tree
+    stack = _get_stack()
+    if len(stack) > 0:
+        stack[-1]["phases"].append(record)
+    stack.append(record)
+
+    start = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record["error"] = repr(e)
+        raise
+    finally:
+        record["wall_time"] = time.perf_counter() - start
+        record["peak_rss"] = get_peak_rss()
+        stack.pop()
+        emit(record)
+
+
+@contextmanager
+def phase(name: str, **fields) -> Iterator[Dict[str, Any]]:
+    """
+    Time a phase of a larger operation.
+
+    Parameters
+    ----------
+    name: str
+        The name of the phase. Ex: "git_checks"
+    fields: Any
+        Any extra values to store on the record. Ex: files=100, bytes=2048
+
+    Yields
+    ------
+    record: Dict[str, Any]
+        The phase record, further fields can be set on it while the phase runs.
+    """
+    with _record("phase", name, **fields) as record:
+        yield record
+
+
+def timed(name: str) -> Callable:
+    """
+    Decorate a function to time every call to it as a phase.
+
+    Parameters
+    ----------
+    name: str
+        The name of the phase.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def operation(
+    name: str, record_dir: Optional[Path] = None, **fields
+) -> Iterator[Dict[str, Any]]:
+    """
+    Time an operation and every phase run within it.
+
+    Parameters
+    ----------
+    name: str
+        The name of the operation. Ex: "push"
+    record_dir: Optional[Path]
+        A directory to store the completed record in. The record is stored under its
+        name in the "timings.json" file of the directory.
+        Default: None (do not store)
+    fields: Any
+        Any extra values to store on the record.
+
+    Yields
+    ------
+    record: Dict[str, Any]
+        The operation record, further fields can be set on it while it runs.
+    """
+    # Store the record even if the operation failed
+    try:
+        with _record("operation", name, **fields) as record:
+            yield record
+    finally:
+        if record_dir is not None:
+            store_record(record, Path(record_dir) / "timings.json")
+
+
+def store_record(record: Dict[str, Any], path: Path):
+    # Keep the most recent record of every other operation
+    records = {}
+    if path.is_file():
+        with open(path, "r") as read_in:
+            records = json.load(read_in)
+
+    records[record["name"]] = record
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as write_out:
+        json.dump(records, write_out, indent=4, default=str)
+        log.debug(f"Stored {record['name']} timings at: {path}")
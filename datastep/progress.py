@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from . import metrics
+
+###############################################################################
+
+log = logging.getLogger(__name__)
+
+###############################################################################
+
+PROGRESS_ENV_VAR_NAME = "DATASTEP_PROGRESS"
+PROGRESS_MODES = ["tqdm", "log", "metrics", "off"]
+
+###############################################################################
+
+
+def _get_env_mode() -> str:
+    # A typo in the environment shouldn't silently disable or break reporting
+    mode = os.environ.get(PROGRESS_ENV_VAR_NAME, "tqdm")
+    if mode not in PROGRESS_MODES:
+        log.warning(
+            f"Unknown {PROGRESS_ENV_VAR_NAME} value: '{mode}'. "
+            f"Use one of: {PROGRESS_MODES}. Falling back to 'tqdm'."
+        )
+        return "tqdm"
+
+    return mode
+
+
+# The mode used by every progress reporter that doesn't specify its own
+_mode = _get_env_mode()
+
+
+def set_mode(mode: str):
+    """
+    Set how progress is reported for long running operations.
+
+    Parameters
+    ----------
+    mode: str
+        "tqdm" for progress bars, "log" for periodic log messages, "metrics" to send
+        progress records to the registered metrics hooks, or "off" for no reporting.
+        Can also be set with the DATASTEP_PROGRESS environment variable.
+        Default: "tqdm"
+    """
+    global _mode
+    if mode not in PROGRESS_MODES:
+        raise ValueError(
+            f"Unknown progress mode: '{mode}'. Use one of: {PROGRESS_MODES}."
+        )
+
+    _mode = mode
+
+
+class ProgressReporter:
+    """
+    A thread safe progress counter that only reports progress periodically.
+
+    Updates are cheap counter increments, the accumulated progress is sent to the
+    reporting backend at most once every `min_interval` seconds. This keeps hot loops
+    (and many threads updating the same reporter) from being slowed by redraws and
+    keeps batch node logs readable.
+
+    Parameters
+    ----------
+    total: int
+        The total number of items that will be processed.
+    desc: str
+        A description of what is being processed.
+    mode: Optional[str]
+        The reporting mode to use, see `datastep.progress.set_mode` for options.
+        Default: None (use the globally set mode)
+    min_interval: float
+        The minimum number of seconds between reports.
+        Default: 1.0
+    """
+
+    def __init__(
+        self,
+        total: int,
+        desc: str,
+        mode: Optional[str] = None,
+        min_interval: float = 1.0,
+    ):
+        self.total = total
+        self.desc = desc
+        self.mode = mode if mode is not None else _mode
+        if self.mode not in PROGRESS_MODES:
+            raise ValueError(
+                f"Unknown progress mode: '{self.mode}'. Use one of: {PROGRESS_MODES}."
+            )
+
+        self.min_interval = min_interval
+        self.n = 0
+        self._pending = 0
+        self._last_report = time.monotonic()
+        self._lock = threading.Lock()
+
+        # Only create a progress bar if it will be used
+        self._pbar = None
+        if self.mode == "tqdm":
+            from tqdm import tqdm
+
+            self._pbar = tqdm(total=total, desc=desc)
+
+    def update(self, n: int = 1):
+        """
+        Add to the processed count. Reported only if enough time has passed.
+        """
+        with self._lock:
+            self._pending += n
+            if time.monotonic() - self._last_report >= self.min_interval:
+                self._report()
+
+    def _report(self):
+        if self._pending == 0:
+            return
+
+        self.n += self._pending
+        if self.mode == "tqdm":
+            self._pbar.update(self._pending)
+        elif self.mode == "log":
+            log.info(f"{self.desc}: {self.n}/{self.total}")
+        elif self.mode == "metrics":
+            metrics.emit(
+                {
+                    "type": "progress",
+                    "name": self.desc,
+                    "n": self.n,
+                    "total": self.total,
+                }
+            )
+
+        self._pending = 0
+        self._last_report = time.monotonic()
+
+    def close(self):
+        """
+        Report any remaining progress and close the reporter.
+        """
+        with self._lock:
+            self._report()
+            if self._pbar is not None:
+                self._pbar.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -2,16 +2,40 @@
 # -*- coding: utf-8 -*-
 
 import json
+import logging
 from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 from pathlib import Path
-from typing import Dict, List, NamedTuple, Tuple, Union
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from . import bundle_utils, compression_utils, file_utils, metrics, transfer
+from .progress import ProgressReporter
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from quilt3.packages import Package, PackageEntry
+    from quilt3.util import PhysicalKey
+
+    from .transfer import AdaptiveConcurrency
 
-import pandas as pd
-from quilt3.packages import Package, PackageEntry
-from tqdm import tqdm
+###############################################################################
+
+log = logging.getLogger(__name__)
+
+###############################################################################
 
-from . import file_utils
+# How many values each validation thread task handles
+VALIDATION_CHUNK_SIZE = 1000
 
 ###############################################################################
 
@@ -60,7 +84,7 @@ def clean_metadata(details: ValidationDetails) -> ValidationDetails:
 
 
 def route_validator(
-    details: ValidationDetails, manifest: pd.DataFrame, progress_bar
+    details: ValidationDetails, manifest: "pd.DataFrame", progress_bar=None
 ) -> ValidationDetails:
     if details.details_type == "path":
         result = validate_filepath(details)
@@ -71,18 +95,30 @@ def route_validator(
     manifest.at[result.index, result.origin_column] = result.value
 
     # Update progress
-    progress_bar.update()
+    if progress_bar is not None:
+        progress_bar.update()
 
     return result
 
 
+def _route_validator_chunk(
+    chunk: List[ValidationDetails], manifest: "pd.DataFrame", progress_bar
+) -> List[ValidationDetails]:
+    results = [route_validator(details, manifest) for details in chunk]
+
+    # Update progress once per chunk instead of once per value
+    progress_bar.update(len(chunk))
+
+    return results
+
+
 ###############################################################################
 
 # VALIDATION
 
 
-def validate_manifest(
-    manifest: pd.DataFrame, filepath_columns: List[str], metadata_columns: List[str]
+def _check_manifest_columns(
+    manifest: "pd.DataFrame", filepath_columns: List[str], metadata_columns: List[str]
 ):
     # Check filepath columns exist in manifest
     for col in filepath_columns:
@@ -100,6 +136,13 @@ def validate_manifest(
                 f"in manifest columns: {manifest.columns}"
             )
 
+
+@metrics.timed("validate_manifest")
+def validate_manifest(
+    manifest: "pd.DataFrame", filepath_columns: List[str], metadata_columns: List[str]
+):
+    _check_manifest_columns(manifest, filepath_columns, metadata_columns)
+
     # Create large list of paths to validate and metadata to clean
     details_to_validate_or_clean = []
 
@@ -121,18 +164,28 @@ def validate_manifest(
                 )
             )
 
-    # Create progress bar
-    with tqdm(total=len(details_to_validate_or_clean), desc="Validating") as pbar:
+    # Split into chunks so each thread handles many values per task
+    chunks = [
+        details_to_validate_or_clean[i : i + VALIDATION_CHUNK_SIZE]
+        for i in range(0, len(details_to_validate_or_clean), VALIDATION_CHUNK_SIZE)
+    ]
+
+    # Create progress reporter
+    with ProgressReporter(
+        total=len(details_to_validate_or_clean), desc="Validating"
+    ) as progress:
         # Create a deep copy of the dataframe to mutate
         manifest = manifest.copy(deep=True)
 
         # Create validator partial
-        validator_func = partial(route_validator, manifest=manifest, progress_bar=pbar)
+        validator_func = partial(
+            _route_validator_chunk, manifest=manifest, progress_bar=progress
+        )
 
         # Threaded validation and update
         with ThreadPoolExecutor() as exe:
             # We cast to a list to force a block until all are done
-            list(exe.map(validator_func, details_to_validate_or_clean))
+            list(exe.map(validator_func, chunks))
 
     return manifest
 
@@ -142,7 +195,13 @@ def validate_manifest(
 # PACKAGING
 
 
-def _recursive_clean(pkg: Package, metadata_reduction_map: Dict[str, bool]):
+def _recursive_clean(
+    pkg: "Package",
+    metadata_reduction_map: Dict[str, bool],
+    drop_unreduced: bool = False,
+):
+    from quilt3.packages import PackageEntry
+
     # For all keys in current package level
     for key in pkg:
         # If it is a PackageEntry object, we know we have hit a leaf node
@@ -175,23 +234,82 @@ def _recursive_clean(pkg: Package, metadata_reduction_map: Dict[str, bool]):
                 if metadata_reduction_map[meta_k]:
                     cleaned_meta[meta_k] = meta_v[0]
                 # Else, do not reduce
-                else:
+                # Unless the full values are stored elsewhere, then drop them entirely
+                elif not drop_unreduced:
                     cleaned_meta[meta_k] = meta_v
 
             # Update the object with the cleaned metadata
             pkg[key].set_meta(cleaned_meta)
         else:
-            _recursive_clean(pkg[key], metadata_reduction_map)
+            _recursive_clean(pkg[key], metadata_reduction_map, drop_unreduced)
 
     return pkg
 
 
+def _coerce_metadata_column(column: "pd.Series") -> List[Any]:
+    # Convert an entire metadata column to JSON serializable Python values at once
+    # based on the column dtype instead of inspecting every value individually
+    # `tolist` already converts numpy scalars to Python scalars
+    import numpy as np
+    import pandas as pd
+
+    values = column.tolist()
+
+    # Only plain numpy dtypes take the fast paths, nullable extension dtypes (Int64,
+    # boolean, Float64) hold pd.NA for missing values which isn't JSON serializable
+    if isinstance(column.dtype, np.dtype):
+        # Numeric and boolean columns are ready to use
+        if column.dtype.kind in "biuf":
+            return values
+
+        # Datetimes and timedeltas are stored as strings, missing values as None
+        if column.dtype.kind in "mM":
+            return [None if v is pd.NaT else str(v) for v in values]
+
+    # Object (and any other) columns can hold anything, keep the JSON native values
+    # and cast everything else (Paths, datetimes, custom objects) to strings
+    coerced = []
+    n_cast = 0
+    for v in values:
+        # Numpy scalars can still end up in object columns
+        if hasattr(v, "dtype") and hasattr(v, "item"):
+            v = v.item()
+
+        if v is None or v is pd.NA or v is pd.NaT:
+            coerced.append(None)
+        elif isinstance(v, (str, int, float, bool)):
+            coerced.append(v)
+        elif isinstance(v, (list, tuple, dict)):
+            coerced.append(file_utils.make_json_serializable(v))
+        else:
+            coerced.append(str(v))
+            n_cast += 1
+
+    if n_cast > 0:
+        log.debug(
+            f"Cast {n_cast} values to string to make JSON serializable. "
+            f"Column: {column.name}"
+        )
+
+    return coerced
+
+
+@metrics.timed("create_package")
 def create_package(
-    manifest: pd.DataFrame,
+    manifest: "pd.DataFrame",
     step_pkg_root: Path,
     filepath_columns: List[str] = ["filepath"],
     metadata_columns: List[str] = [],
-) -> Tuple[Package, pd.DataFrame]:
+    validate: bool = False,
+    sidecar_metadata: bool = False,
+) -> Tuple["Package", "pd.DataFrame"]:
+    from quilt3.packages import Package
+
+    # Validate in the same pass that builds the package rather than walking the
+    # manifest twice, missing files are found as they are reached
+    if validate:
+        _check_manifest_columns(manifest, filepath_columns, metadata_columns)
+
     # Make a copy
     relative_manifest = manifest.copy(deep=True)
 
@@ -231,8 +349,19 @@ def create_package(
     # and cause a package distribution error.
     metadata_reduction_map = {index_col: True for index_col in metadata_columns}
 
+    # The package root is only resolved once
+    # Each unique filepath is only resolved once no matter how many rows reference it
+    pkg_root = file_utils._filepath_rel2abs(step_pkg_root)
+    resolved_paths = {}
+
+    # Coerce every metadata column to JSON serializable values up front
+    metadata = {
+        meta_col: _coerce_metadata_column(relative_manifest[meta_col])
+        for meta_col in metadata_columns
+    }
+
     # Set all files
-    with tqdm(
+    with ProgressReporter(
         total=len(filepath_columns) * len(relative_manifest),
         desc="Constructing package",
     ) as pbar:
@@ -240,58 +369,56 @@ def create_package(
             # Update values to the logical key as they are set
             for i, val in enumerate(relative_manifest[col].values):
                 # Fully resolve the path
-                physical_key = Path(val).expanduser().resolve()
-
-                # Try creating a logical key from the relative of step
-                # local staging to the filepath
-                #
-                # Ex:
-                # step_pkg_root = "local_staging/raw"
-                # physical_key = "local_staging/raw/images/some_file.tiff"
-                # produced logical_key = "images/some_file.tiff"
-                try:
-                    logical_key = str(
-                        file_utils._filepath_rel2abs(physical_key).relative_to(
-                            file_utils._filepath_rel2abs(step_pkg_root)
-                        )
-                    )
+                if (col, val) not in resolved_paths:
+                    physical_key = Path(val).expanduser().resolve()
 
-                except ValueError:
-                    # Create logical key from merging column and filename
-                    # Also remove any obvious "path" type words from column name
+                    # Try creating a logical key from the relative of step
+                    # local staging to the filepath
                     #
                     # Ex:
-                    # physical_key = "/some/abs/path/some_file.tiff"
-                    # column = "SourceReadPath"
-                    # produced logical_key = "source/some_file.tiff"
-                    stripped_col = col.lower().replace("read", "").replace("path", "")
-                    logical_key = f"{stripped_col}/{physical_key.name}"
+                    # step_pkg_root = "local_staging/raw"
+                    # physical_key = "local_staging/raw/images/some_file.tiff"
+                    # produced logical_key = "images/some_file.tiff"
+                    try:
+                        logical_key = str(physical_key.relative_to(pkg_root))
+
+                    except ValueError:
+                        # Create logical key from merging column and filename
+                        # Also remove any obvious "path" type words from column name
+                        #
+                        # Ex:
+                        # physical_key = "/some/abs/path/some_file.tiff"
+                        # column = "SourceReadPath"
+                        # produced logical_key = "source/some_file.tiff"
+                        stripped_col = (
+                            col.lower().replace("read", "").replace("path", "")
+                        )
+                        logical_key = f"{stripped_col}/{physical_key.name}"
+
+                    resolved_paths[(col, val)] = (
+                        physical_key,
+                        logical_key,
+                        physical_key.is_file(),
+                    )
 
-                if physical_key.is_file():
+                physical_key, logical_key, is_file = resolved_paths[(col, val)]
+
+                # Only paths that aren't files need the extra check for existence
+                if validate and not is_file and not physical_key.is_dir():
+                    raise FileNotFoundError(
+                        f"Failed to find file: '{val}'. "
+                        f"Source column: '{col}', "
+                        f"at index: {relative_manifest.index[i]}."
+                    )
+
+                if is_file:
                     relative_manifest[col].values[i] = logical_key
 
                     # Create metadata dictionary to attach to object
-                    meta = {}
-                    for meta_col in metadata_columns:
-                        # Short reference to current metadata value
-                        v = relative_manifest[meta_col].values[i]
-
-                        # Enforce simple JSON serializable type
-                        # First check if value is a numpy value
-                        # It likely is because pandas relies on numpy
-                        # All numpy types have the "dtype" attribute and can be cast to
-                        # python type by using the `item` function, details here:
-                        # https://docs.scipy.org/doc/numpy/reference/generated/numpy.ndarray.item.html
-                        if hasattr(v, "dtype"):
-                            v = v.item()
-
-                        # Cast to JSON serializable type
-                        v = file_utils.make_json_serializable(
-                            v, f"Value from column: {meta_col}, index: {i}"
-                        )
-
-                        # Update metadata with value
-                        meta[meta_col] = [v]
+                    meta = {
+                        meta_col: [metadata[meta_col][i]]
+                        for meta_col in metadata_columns
+                    }
 
                     # Check if object already exists
                     if logical_key in pkg:
@@ -352,16 +479,361 @@ def create_package(
                 pbar.update()
 
         # Clean up package metadata
-        pkg = _recursive_clean(pkg, metadata_reduction_map)
+        # With sidecar metadata, entries only keep the metadata that reduced to a
+        # single value, the full metadata and associates are joined on demand from the
+        # relative manifest and manifest index that are stored with the package
+        pkg = _recursive_clean(
+            pkg, metadata_reduction_map, drop_unreduced=sidecar_metadata
+        )
+        if sidecar_metadata:
+            return pkg, relative_manifest
 
         # Attach associates
-        for i, associate_mapping in tqdm(
-            enumerate(associates), desc="Creating associate metadata blocks"
-        ):
-            for col, lk in associate_mapping.items():
-                # Having dictionary expansion in this order means that associates will
-                # override a prior existing `associates` key, this is assumed safe
-                # because attach_associates was set to True.
-                pkg[lk].set_meta({**pkg[lk].meta, **{"associates": associate_mapping}})
+        with ProgressReporter(
+            total=len(associates), desc="Creating associate metadata blocks"
+        ) as associates_pbar:
+            for i, associate_mapping in enumerate(associates):
+                for col, lk in associate_mapping.items():
+                    # Having dictionary expansion in this order means that associates
+                    # will override a prior existing `associates` key, this is assumed
+                    # safe because attach_associates was set to True.
+                    pkg[lk].set_meta(
+                        {**pkg[lk].meta, **{"associates": associate_mapping}}
+                    )
+
+                associates_pbar.update()
 
         return pkg, relative_manifest
+
+
+@metrics.timed("create_manifest_index")
+def create_manifest_index(
+    relative_manifest: "pd.DataFrame", filepath_columns: List[str]
+) -> Dict[str, Any]:
+    # Create the lookup from logical key to every (row, column) pair that references
+    # it. Rows are positional so that they line up with the relative manifest that is
+    # stored next to the index in the package.
+    #
+    # Ex:
+    # {
+    #     "filepath_columns": ["filepath", "thumbnail"],
+    #     "logical_keys": {
+    #         "images/a.tiff": {"rows": [0, 1], "columns": ["filepath", "filepath"]},
+    #         "thumbs/a.png": {"rows": [0], "columns": ["thumbnail"]},
+    #     },
+    #     "associates": [
+    #         {"filepath": "images/a.tiff", "thumbnail": "thumbs/a.png"},
+    #         {"filepath": "images/a.tiff"},
+    #     ],
+    # }
+    logical_keys = {}
+    associates = [{} for i in range(len(relative_manifest))]
+    for col in filepath_columns:
+        # Rows without a file in this column have nothing to look up
+        is_null = relative_manifest[col].isna().values
+        for i, lk in enumerate(relative_manifest[col].values):
+            if is_null[i]:
+                continue
+
+            lk = str(lk)
+            lookup = logical_keys.setdefault(lk, {"rows": [], "columns": []})
+            lookup["rows"].append(i)
+            lookup["columns"].append(col)
+            associates[i][col] = lk
+
+    return {
+        "filepath_columns": list(filepath_columns),
+        "logical_keys": logical_keys,
+        "associates": associates,
+    }
+
+
+def get_package_stats(pkg: "Package") -> Dict[str, int]:
+    # Count files and bytes from the entries, sizes are known without a file stat
+    files = 0
+    total_bytes = 0
+    for logical_key, entry in pkg.walk():
+        files += 1
+        total_bytes += entry.size
+
+    return {"files": files, "bytes": total_bytes}
+
+
+def get_latest_top_hash(name: str, registry: str) -> Optional[str]:
+    # Read the latest pointer directly, much cheaper than browsing the whole manifest
+    import botocore
+    from quilt3.data_transfer import get_bytes
+    from quilt3.util import PhysicalKey, fix_url
+
+    try:
+        from quilt3.backends import get_package_registry
+
+        latest = get_package_registry(registry).pointer_latest_pk(name)
+    except ImportError:
+        # Older quilt versions only know the original registry layout
+        latest = PhysicalKey.from_url(fix_url(registry)).join(
+            f".quilt/named_packages/{name}/latest"
+        )
+
+    try:
+        return get_bytes(latest).decode("utf-8").strip()
+    except FileNotFoundError:
+        return None
+    except botocore.exceptions.ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+            return None
+
+        raise
+
+
+def get_entry_hashes(pkg: "Package") -> Dict[str, Optional[str]]:
+    # Map every logical key to its content hash to compare package subtrees
+    return {
+        logical_key: entry.hash["value"] if entry.hash is not None else None
+        for logical_key, entry in pkg.walk()
+    }
+
+
+def _get_hash_key(entry: "PackageEntry") -> Tuple[str, str]:
+    # Hashes of different types can't be compared, key on both the type and value
+    return (entry.hash["type"], entry.hash["value"])
+
+
+def get_remote_keys(pkg: "Package") -> Dict[Tuple[str, str], "PhysicalKey"]:
+    # Only versioned keys are reused, an unversioned object can be overwritten by a
+    # later push to the same logical key
+    remote_keys = {}
+    for logical_key, entry in pkg.walk():
+        physical_key = entry.physical_key
+        if (
+            entry.hash is not None
+            and not physical_key.is_local()
+            and physical_key.version_id is not None
+        ):
+            remote_keys.setdefault(_get_hash_key(entry), physical_key)
+
+    return remote_keys
+
+
+def dedupe_package(
+    pkg: "Package", remote_keys: Dict[Tuple[str, str], "PhysicalKey"]
+) -> Dict[str, int]:
+    # Point local entries whose content is already in the registry at the existing
+    # remote copy so their bytes aren't uploaded again
+    duplicates = [
+        (logical_key, entry, remote_keys[_get_hash_key(entry)])
+        for logical_key, entry in pkg.walk()
+        if entry.physical_key.is_local()
+        and entry.hash is not None
+        and _get_hash_key(entry) in remote_keys
+    ]
+
+    total_bytes = 0
+    for logical_key, entry, remote_key in duplicates:
+        pkg.set(logical_key, entry.with_physical_key(remote_key))
+        total_bytes += entry.size
+
+    return {"files": len(duplicates), "bytes": total_bytes}
+
+
+@metrics.timed("upload")
+def _copy_file_list(
+    file_list: List[Tuple["PhysicalKey", "PhysicalKey", int]],
+    controller: Optional["AdaptiveConcurrency"] = None,
+) -> List[Any]:
+    from quilt3.data_transfer import copy_file_list
+
+    # Without a controller copy everything at once with quilt's own concurrency
+    if controller is None:
+        return copy_file_list(file_list, message="Copying objects")
+
+    # Copy in chunks so a throttle only retries the chunk that was throttled
+    return controller.run_chunked(
+        file_list,
+        lambda chunk: copy_file_list(chunk, message="Copying objects"),
+        get_size=lambda copy: copy[2],
+        apply_limit=transfer.set_quilt_concurrency,
+    )
+
+
+def upload_package(
+    pkg: "Package", dest: str, controller: Optional["AdaptiveConcurrency"] = None
+) -> "Package":
+    # Copy the entries to their remote location without publishing a revision, the
+    # same copy quilt makes on push, so that publishing is only a manifest write
+    # Unversioned remote objects may be overwritten in place, they are copied too
+    # Only versioned remote objects are safe to keep referencing
+    from quilt3 import Package
+    from quilt3.util import PhysicalKey, fix_url
+
+    dest_key = PhysicalKey.from_url(fix_url(dest))
+    uploaded = Package()
+    entries = []
+    file_list = []
+    for logical_key, entry in pkg.walk():
+        if entry.physical_key.is_local() or entry.physical_key.version_id is None:
+            entries.append((logical_key, entry))
+            file_list.append(
+                (entry.physical_key, dest_key.join(logical_key), entry.size)
+            )
+        else:
+            uploaded.set(logical_key, entry)
+
+    for (logical_key, entry), result in zip(
+        entries, _copy_file_list(file_list, controller)
+    ):
+        # Newer quilt versions return the versioned key along with a checksum
+        if isinstance(result, tuple):
+            result = result[0]
+
+        uploaded.set(logical_key, entry.with_physical_key(result))
+
+    return uploaded
+
+
+def fetch_package(
+    pkg: "Package", dest: Path, controller: Optional["AdaptiveConcurrency"] = None
+) -> "Package":
+    # The same copy as Package.fetch, with the transfer optionally chunked
+    from quilt3 import Package
+    from quilt3.util import PhysicalKey
+
+    dest_key = PhysicalKey.from_path(str(Path(dest).resolve()))
+    fetched = Package()
+    file_list = []
+    for logical_key, entry in pkg.walk():
+        fetched_key = dest_key.join(logical_key)
+        file_list.append((entry.physical_key, fetched_key, entry.size))
+        fetched.set(logical_key, entry.with_physical_key(fetched_key))
+
+    _copy_file_list(file_list, controller)
+
+    return fetched
+
+
+@metrics.timed("hash")
+def set_package_hashes(pkg: "Package", n_workers: Optional[int] = None) -> "Package":
+    # Only local files that quilt would otherwise hash serially on push
+    entries = [
+        entry
+        for logical_key, entry in pkg.walk()
+        if entry.hash is None and entry.physical_key.is_local()
+    ]
+
+    # Hash every unique file in parallel then attach the hashes to the entries
+    hashes = file_utils.hash_files(
+        [entry.physical_key.path for entry in entries], n_workers=n_workers
+    )
+    for entry in entries:
+        entry.hash = {"type": "SHA256", "value": hashes[entry.physical_key.path]}
+
+    return pkg
+
+
+@metrics.timed("bundle")
+def bundle_package(
+    pkg: "Package",
+    dirpath: Path,
+    threshold: int,
+    shard_size: int = bundle_utils.DEFAULT_SHARD_SIZE,
+) -> "Package":
+    # Replace every local file smaller than the threshold with a few large shards
+    # The logical keys of the bundled files are kept in the bundle index so checkout
+    # restores them exactly where they were
+    members = [
+        bundle_utils.BundleMember(
+            logical_key=logical_key,
+            filepath=Path(entry.physical_key.path),
+            size=entry.size,
+            meta=entry.meta,
+        )
+        for logical_key, entry in pkg.walk()
+        if entry.size < threshold and entry.physical_key.is_local()
+    ]
+    if len(members) == 0:
+        return pkg
+
+    bundle_index = bundle_utils.create_bundles(members, dirpath, shard_size)
+    for member in members:
+        pkg.delete(member.logical_key)
+    for shard in bundle_index["shards"]:
+        shard_key = f"{bundle_utils.BUNDLE_DIR}/{shard}"
+        pkg.set(shard_key, dirpath / shard_key)
+    pkg.set(bundle_utils.BUNDLE_INDEX, dirpath / bundle_utils.BUNDLE_INDEX)
+
+    log.info(
+        f"Bundled {len(members)} files smaller than {threshold} bytes into "
+        f"{len(bundle_index['shards'])} shards"
+    )
+    return pkg
+
+
+def _is_selected(logical_key: str, selected_keys: Set[str]) -> bool:
+    # A file is selected if it or any directory containing it was selected
+    parts = logical_key.split("/")
+    return any("/".join(parts[:i]) in selected_keys for i in range(1, len(parts) + 1))
+
+
+@metrics.timed("compress")
+def compress_package(
+    pkg: "Package",
+    dirpath: Path,
+    relative_manifest: "pd.DataFrame",
+    columns: List[str] = [],
+    extensions: List[str] = [],
+    level: int = compression_utils.DEFAULT_COMPRESSION_LEVEL,
+    n_workers: Optional[int] = None,
+) -> "Package":
+    # Files are selected by the logical keys stored in the chosen filepath columns
+    # or by extension
+    selected_keys = set()
+    for col in columns:
+        selected_keys.update(str(lk) for lk in relative_manifest[col].unique())
+    extensions = tuple(ext.lower() for ext in extensions)
+
+    selected = [
+        (logical_key, entry)
+        for logical_key, entry in pkg.walk()
+        if entry.physical_key.is_local()
+        and (
+            _is_selected(logical_key, selected_keys)
+            or logical_key.lower().endswith(extensions)
+        )
+    ]
+    if len(selected) == 0:
+        return pkg
+
+    # Compressed files keep their logical keys so the manifest is unchanged
+    # The codec is recorded on the entry so checkout knows to decompress it
+    compression_utils.compress_files(
+        [
+            (Path(entry.physical_key.path), dirpath / logical_key)
+            for logical_key, entry in selected
+        ],
+        level=level,
+        n_workers=n_workers,
+    )
+    for logical_key, entry in selected:
+        pkg.set(
+            logical_key,
+            dirpath / logical_key,
+            {**entry.meta, compression_utils.CODEC_META_KEY: compression_utils.CODEC},
+        )
+
+    log.info(f"Compressed {len(selected)} files with {compression_utils.CODEC}")
+    return pkg
+
+
+@metrics.timed("decompress")
+def decompress_package_files(
+    pkg: "Package", dirpath: Path, n_workers: Optional[int] = None
+) -> int:
+    # Decompress every fetched file that was compressed on push, in place
+    compressed = [
+        dirpath / logical_key
+        for logical_key, entry in pkg.walk()
+        if entry.meta.get(compression_utils.CODEC_META_KEY) == compression_utils.CODEC
+    ]
+    compression_utils.decompress_files(compressed, n_workers=n_workers)
+
+    return len(compressed)
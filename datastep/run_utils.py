@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import cProfile
+import hashlib
+import inspect
+import json
+import logging
+import pstats
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+from . import file_utils
+
+###############################################################################
+
+log = logging.getLogger(__name__)
+
+###############################################################################
+
+# Protected run parameters that don't change what a run produces
+MEMO_IGNORED_PARAMS = ["clean", "checkpoint", "memoize", "profile"]
+
+# Files produced by profiling a run
+PROFILE_ARTIFACTS = ["run_profile.prof", "run_profile.txt", "run_profile.html"]
+
+###############################################################################
+
+
+def find_manifest(dirpath: Path) -> Optional[Path]:
+    # Same lookup order as Step initialization
+    for manifest_name in ["manifest.parquet", "manifest.csv"]:
+        if (dirpath / manifest_name).is_file():
+            return dirpath / manifest_name
+
+    return None
+
+
+def _is_project_module(module: ModuleType) -> bool:
+    # Modules installed into the environment (the standard library and site
+    # packages) are versioned by the environment, anything else is project code
+    # datastep itself is covered by its version
+    source_file = getattr(module, "__file__", None)
+    if (
+        source_file is None
+        or not source_file.endswith(".py")
+        or module.__name__.split(".")[0] == "datastep"
+    ):
+        return False
+
+    path = Path(source_file).resolve()
+    if "site-packages" in path.parts or "dist-packages" in path.parts:
+        return False
+
+    for prefix in {sys.prefix, sys.base_prefix, sys.exec_prefix}:
+        if Path(prefix).resolve() in path.parents:
+            return False
+
+    return True
+
+
+def get_source_hash(obj: Any) -> Optional[str]:
+    # Hash the whole source file of the object, so that changes to helper functions
+    # defined alongside the object are caught, and the source of every project module
+    # it references, so that changes to imported helper modules are caught
+    try:
+        source_file = inspect.getsourcefile(obj)
+    except TypeError:
+        return None
+
+    module = inspect.getmodule(obj)
+    if source_file is None or module is None or not Path(source_file).is_file():
+        return None
+
+    # Walk the module level references of each module, modules are keyed by name so
+    # that the hash is the same wherever the project is stored
+    source_hashes = {module.__name__: file_utils.hash_file(source_file)}
+    to_visit = [module]
+    while len(to_visit) > 0:
+        for value in list(vars(to_visit.pop()).values()):
+            if isinstance(value, ModuleType):
+                referenced = value
+            else:
+                referenced = sys.modules.get(getattr(value, "__module__", None) or "")
+
+            if (
+                referenced is not None
+                and referenced.__name__ not in source_hashes
+                and _is_project_module(referenced)
+            ):
+                source_hashes[referenced.__name__] = file_utils.hash_file(
+                    referenced.__file__
+                )
+                to_visit.append(referenced)
+
+    return hashlib.sha256(
+        json.dumps(source_hashes, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+def create_run_memo_key(
+    params: Dict[str, Any],
+    upstream_manifests: Dict[str, Optional[Path]],
+    code_version: str,
+    datastep_version: str,
+) -> str:
+    # Drop the protected parameters that don't impact the produced data
+    params = {k: v for k, v in params.items() if k not in MEMO_IGNORED_PARAMS}
+    if "kwargs" in params:
+        params["kwargs"] = {
+            k: v for k, v in params["kwargs"].items() if k not in MEMO_IGNORED_PARAMS
+        }
+
+    # Upstream data is identified by the contents of the upstream manifests
+    upstream = {
+        name: file_utils.hash_file(manifest) if manifest is not None else None
+        for name, manifest in upstream_manifests.items()
+    }
+
+    # Combine everything into a single stable JSON string and hash
+    memo_components = json.dumps(
+        {
+            "params": params,
+            "upstream": upstream,
+            "code_version": code_version,
+            "datastep_version": datastep_version,
+        },
+        default=str,
+        sort_keys=True,
+    )
+    log.debug(f"Run memo components: {memo_components}")
+
+    return hashlib.sha256(memo_components.encode("utf-8")).hexdigest()
+
+
+def manifest_files_exist(manifest: Any, filepath_columns: List[str]) -> bool:
+    # Check that every file referenced by the manifest is still available
+    for col in filepath_columns:
+        if col not in manifest.columns:
+            return False
+
+        for f in manifest[col].unique():
+            if not Path(f).expanduser().exists():
+                log.debug(f"Memoized manifest file no longer exists: {f}")
+                return False
+
+    return True
+
+
+def get_manifest_file_stats(manifest: Any, filepath_columns: List[str]) -> Dict:
+    # Count each unique file once even if many rows reference it
+    files = set()
+    for col in filepath_columns:
+        if col in manifest.columns:
+            files.update(str(f) for f in manifest[col].unique())
+
+    total_bytes = 0
+    for f in files:
+        f = Path(f).expanduser()
+        if f.is_file():
+            total_bytes += f.stat().st_size
+
+    return {"output_files": len(files), "output_bytes": total_bytes}
+
+
+def get_partition_dir(step_local_staging_dir: Path, index: int) -> Path:
+    return step_local_staging_dir / "partitions" / f"partition-{index:06d}"
+
+
+def run_partition(
+    func: Callable, partition: Any, partition_dir: Path, kwargs: Dict[str, Any]
+) -> Optional[Path]:
+    # Each partition gets its own staging directory to write files into
+    partition_dir.mkdir(parents=True, exist_ok=True)
+    shard = func(partition, partition_dir, **kwargs)
+    if shard is None:
+        return None
+
+    # Paths aren't storable in Parquet, cast them to strings
+    # DataFrame.applymap was renamed to DataFrame.map in pandas 2.1
+    def cast_path(value: Any) -> Any:
+        return str(value) if isinstance(value, Path) else value
+
+    if hasattr(type(shard), "map"):
+        shard = shard.map(cast_path)
+    else:
+        shard = shard.applymap(cast_path)
+
+    # Store the manifest shard next to the files it references
+    shard_path = partition_dir / "manifest.parquet"
+    shard.to_parquet(shard_path)
+
+    return shard_path
+
+
+def _find_profiler(profiler: Union[bool, str]) -> str:
+    # Prefer the low overhead sampling profiler when it is installed
+    if profiler is True:
+        try:
+            import pyinstrument  # noqa: F401
+
+            return "pyinstrument"
+        except ImportError:
+            return "cprofile"
+
+    if profiler not in ["pyinstrument", "cprofile"]:
+        raise ValueError(
+            f"Unknown profiler: '{profiler}'. "
+            f"Use one of: True, 'pyinstrument', or 'cprofile'."
+        )
+
+    return profiler
+
+
+@contextmanager
+def profile(
+    dirpath: Path, profiler: Union[bool, str] = True, top_n: int = 50
+) -> Iterator[str]:
+    # Remove the artifacts of a prior profile so they are never mixed up
+    for artifact in PROFILE_ARTIFACTS:
+        if (dirpath / artifact).is_file():
+            (dirpath / artifact).unlink()
+
+    profiler = _find_profiler(profiler)
+    if profiler == "pyinstrument":
+        from pyinstrument import Profiler
+
+        p = Profiler()
+        p.start()
+        try:
+            yield profiler
+        finally:
+            p.stop()
+            with open(dirpath / "run_profile.txt", "w") as write_out:
+                write_out.write(p.output_text())
+            with open(dirpath / "run_profile.html", "w") as write_out:
+                write_out.write(p.output_html())
+    else:
+        p = cProfile.Profile()
+        p.enable()
+        try:
+            yield profiler
+        finally:
+            p.disable()
+            p.dump_stats(str(dirpath / "run_profile.prof"))
+            with open(dirpath / "run_profile.txt", "w") as write_out:
+                stats = pstats.Stats(p, stream=write_out)
+                stats.sort_stats("cumulative").print_stats(top_n)
+
+    log.info(f"Stored {profiler} profile of run in: {dirpath}")
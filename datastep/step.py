@@ -5,21 +5,37 @@ import getpass
 import inspect
 import json
 import logging
+import math
 import os
+import time
 import warnings
+from concurrent.futures import ProcessPoolExecutor
 from functools import wraps
 from pathlib import Path
 from tempfile import TemporaryDirectory
-from typing import Any, Dict, List, Optional, Union
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple, Union
 
-import botocore
-import git
-import pandas as pd
 import prefect
-import quilt3
 from prefect import Flow, Task
 
-from . import constants, exceptions, file_utils, get_module_version, quilt_utils
+from . import (
+    bundle_utils,
+    constants,
+    exceptions,
+    file_utils,
+    get_module_version,
+    metrics,
+    quilt_utils,
+    run_utils,
+    transfer,
+)
+from .manifest_writer import ManifestWriter
+
+# Heavy dependencies are imported where they are used to keep imports fast
+if TYPE_CHECKING:
+    import git
+    import pandas as pd
+    from quilt3 import Package
 
 ###############################################################################
 
@@ -28,36 +44,142 @@ log = logging.getLogger(__name__)
 ###############################################################################
 
 
+def _get_protected_param(params: Dict[str, Any], name: str) -> Any:
+    # If the user has defined the parameter in their run function it will be in
+    # top level params, if they haven't it will be in the kwargs
+    if name in params:
+        return params[name]
+    elif "kwargs" in params:
+        return params["kwargs"].get(name)
+
+    return None
+
+
+def _get_git_repo() -> "git.Repo":
+    import git
+
+    # This will throw an error if the current working directory is not a git repo
+    return git.Repo(Path(".").expanduser().resolve())
+
+
+def _logged_run(func: Callable, self: "Step", *args, **kwargs) -> Any:
+    # Get the params for the function, not the wrapper
+    params = inspect.signature(func).bind(self, *args, **kwargs).arguments
+    params.pop("self")
+    parameter_store = self.step_local_staging_dir / "run_parameters.json"
+
+    # Read the params of the prior run to check if this run can resume it
+    prior_params = None
+    if parameter_store.is_file():
+        with open(parameter_store, "r") as read_in:
+            prior_params = json.load(read_in)
+
+    # Check if we want to clean the step local staging prior to run
+    # This happens first so that a clean run never restores the local memo
+    clean = _get_protected_param(params, "clean")
+    if clean:
+        with metrics.phase("clean"):
+            file_utils._clean(
+                self.step_local_staging_dir,
+                background=self._background_clean,
+                n_workers=self._clean_workers,
+            )
+        log.info(f"Cleaned directory: {self.step_local_staging_dir}")
+
+    # Skip the run entirely if a prior run with the same inputs and code is
+    # available locally or in the registry
+    memoize = _get_protected_param(params, "memoize")
+    if memoize:
+        with metrics.phase("memoize"):
+            memo_key = self._get_run_memo_key(params)
+            found_memoized_run, result = self._restore_memoized_run(memo_key)
+        if found_memoized_run:
+            log.info(f"Restored memoized run with key: {memo_key}")
+            return result
+
+    # Any prior memo is invalid as soon as a new run starts
+    memo_store = self.step_local_staging_dir / "run_memo.json"
+    if memo_store.is_file():
+        memo_store.unlink()
+
+    # Dump run params
+    with open(parameter_store, "w") as write_out:
+        json.dump(params, write_out, default=str)
+        log.debug(f"Stored params for run at: {parameter_store}")
+
+    # Resume from the completed units of the prior run if checkpointing was
+    # requested and the prior run used the exact same parameters
+    # Otherwise, drop any manifest rows registered by a prior run
+    if (
+        _get_protected_param(params, "checkpoint")
+        and not clean
+        and prior_params == json.loads(json.dumps(params, default=str))
+    ):
+        log.info(
+            f"Resuming prior run with "
+            f"{len(self.manifest_writer.completed_units)} completed units."
+        )
+    else:
+        self.manifest_writer.reset()
+
+    resources_start = metrics.sample_resources()
+    profiler = _get_protected_param(params, "profile")
+    with metrics.phase("run"):
+        if profiler:
+            with run_utils.profile(self.step_local_staging_dir, profiler):
+                result = func(self, *args, **kwargs)
+        else:
+            result = func(self, *args, **kwargs)
+
+    # If rows were registered during the run they become the step manifest
+    self.manifest_writer.flush()
+    if len(self.manifest_writer.parts) > 0:
+        self.manifest = None
+
+    # Store the resources used by the run and the size of what it produced
+    run_stats = metrics.get_resource_usage(resources_start)
+    if self.manifest is not None:
+        run_stats.update(
+            run_utils.get_manifest_file_stats(self.manifest, self.filepath_columns)
+        )
+    stats_store = self.step_local_staging_dir / "run_stats.json"
+    with open(stats_store, "w") as write_out:
+        json.dump(run_stats, write_out, indent=4)
+        log.debug(f"Stored stats for run at: {stats_store}")
+
+    # Store the result and the memo key for future runs to restore
+    # The result is stored as JSON, never pickled, as pushed results are read back
+    # from the shared registry
+    if memoize:
+        try:
+            serialized_result = json.dumps(result)
+        except TypeError:
+            log.warning(
+                f"The result of this run ({type(result)}) is not JSON serializable. "
+                f"The run will not be memoized."
+            )
+        else:
+            result_store = self.step_local_staging_dir / "run_result.json"
+            with open(result_store, "w") as write_out:
+                write_out.write(serialized_result)
+            with open(memo_store, "w") as write_out:
+                json.dump({"key": memo_key}, write_out)
+            log.debug(f"Stored run memo at: {memo_store}")
+
+    return result
+
+
 # decorator for run that logs non default args and kwargs to file
 def log_run_params(func):
     @wraps(func)
     def wrapper(self, *args, **kwargs):
-        # Get the params for the function, not the wrapper
-        params = inspect.signature(func).bind(self, *args, **kwargs).arguments
-        params.pop("self")
-
         # In the case the operation is happening in a distributed fashion
         # Always make the local staging dir prior to run
         self.step_local_staging_dir.mkdir(parents=True, exist_ok=True)
-        parameter_store = self.step_local_staging_dir / "run_parameters.json"
-
-        # Dump run params
-        with open(parameter_store, "w") as write_out:
-            json.dump(params, write_out, default=str)
-            log.debug(f"Stored params for run at: {parameter_store}")
-
-        # Check if we want to clean the step local staging prior to run
-        # If the user has defined clean in their run function it will be in
-        # top level params, if they haven't it will be in the kwargs
-        if "clean" in params and params["clean"]:
-            file_utils._clean(self.step_local_staging_dir)
-            log.info(f"Cleaned directory: {self.step_local_staging_dir}")
-        elif "kwargs" in params:
-            if "clean" in params["kwargs"] and params["kwargs"]["clean"]:
-                file_utils._clean(self.step_local_staging_dir)
-                log.info(f"Cleaned directory: {self.step_local_staging_dir}")
 
-        return func(self, *args, **kwargs)
+        # Time the entire run and store the timings next to the run parameters
+        with metrics.operation("run", record_dir=self.step_local_staging_dir):
+            return _logged_run(func, self, *args, **kwargs)
 
     return wrapper
 
@@ -208,6 +330,24 @@ class Step(Task):
         self._project_local_staging_dir = config["project_local_staging_dir"]
         self._step_local_staging_dir = config[self.step_name]["step_local_staging_dir"]
 
+        # Get or default how the step local staging dir is cleaned
+        self._background_clean = config.get(
+            "background_clean", constants.DEFAULT_BACKGROUND_CLEAN
+        )
+        self._clean_workers = config.get("clean_workers", None)
+
+        # Get or default how many workers hash files prior to push
+        self._hash_workers = config.get("hash_workers", None)
+
+        # Get or default the adaptive concurrency settings for registry transfers
+        self._transfer_config = config.get("transfer", {})
+
+        # Get or default how many times publishing is attempted when other steps
+        # publish to the project package at the same time
+        self._push_attempts = config.get(
+            "push_attempts", constants.DEFAULT_PUSH_ATTEMPTS
+        )
+
         return config
 
     def __init__(
@@ -251,15 +391,28 @@ class Step(Task):
             json.dump(params, write_out, default=str)
             log.debug(f"Stored params for run at: {parameter_store}")
 
+        # Rows registered through the manifest writer are stored in this directory
+        self._manifest_writer = None
+        self._manifest_parts_dir = self.step_local_staging_dir / "manifest_parts"
+
         # Attempt to read a previously written manifest produced by this step
         m_path = Path(self.step_local_staging_dir)
 
         # Check if a prior manifest exists
-        if (m_path / "manifest.parquet").is_file():
+        # Manifest parts are reset at the start of every run so if any exist they
+        # were written by the most recent run, assemble them on first access
+        if len(self.manifest_writer.parts) > 0:
+            self.manifest = None
+            log.debug(f"Found manifest parts in: {self._manifest_parts_dir}")
+        elif (m_path / "manifest.parquet").is_file():
+            import pandas as pd
+
             m_path = m_path / "manifest.parquet"
             self.manifest = pd.read_parquet(m_path)
             log.debug(f"Read previously produced manifest from file: {m_path}")
         elif (m_path / "manifest.csv").is_file():
+            import pandas as pd
+
             m_path = m_path / "manifest.csv"
             self.manifest = pd.read_csv(m_path)
             log.debug(f"Read previously produced manifest from file: {m_path}")
@@ -267,6 +420,9 @@ class Step(Task):
             self.manifest = None
             log.debug(f"No previous manifest found. Checked path: {m_path}")
 
+        # The manifest index is lazy loaded on first lookup
+        self._manifest_index = None
+
         # Set name for prefect task retrieval
         self.name = self.step_name
 
@@ -276,6 +432,46 @@ class Step(Task):
             f"{self.step_local_staging_dir}"
         )
 
+    @property
+    def manifest(self) -> Optional["pd.DataFrame"]:
+        """
+        The manifest of files produced by this step.
+
+        If rows were registered with the manifest writer during the most recent run,
+        the manifest is assembled from the stored parts on first access.
+        """
+        if self._manifest is None and len(self.manifest_writer.parts) > 0:
+            self._manifest = self.manifest_writer.read()
+            log.debug(f"Assembled manifest from parts in: {self._manifest_parts_dir}")
+
+        return self._manifest
+
+    @manifest.setter
+    def manifest(self, manifest: Optional["pd.DataFrame"]):
+        self._manifest = manifest
+
+    @property
+    def manifest_writer(self) -> ManifestWriter:
+        """
+        An append-only manifest writer for registering files as they are produced.
+
+        Rows are periodically spilled to Parquet parts in the step local staging
+        directory, so long running steps don't need to hold the entire manifest in
+        memory and already registered rows survive a crash. Any rows registered during
+        a run become the step manifest once the run completes.
+
+        Examples
+        --------
+        >>> for i, image in enumerate(images):
+        ...     save_path = self.step_local_staging_dir / f"image_{i}.tiff"
+        ...     imsave(save_path, image)
+        ...     self.manifest_writer.append({"filepath": save_path, "index": i})
+        """
+        if self._manifest_writer is None:
+            self._manifest_writer = ManifestWriter(self._manifest_parts_dir)
+
+        return self._manifest_writer
+
     @property
     def step_name(self) -> str:
         """
@@ -346,6 +542,9 @@ class Step(Task):
         distributed_executor_address: Optional[str] = None,
         clean: bool = False,
         debug: bool = False,
+        checkpoint: bool = False,
+        memoize: bool = False,
+        profile: Union[bool, str] = False,
         **kwargs,
     ) -> Any:
         """
@@ -364,6 +563,26 @@ class Step(Task):
             A debug flag for the developer to use to manipulate how much data runs,
             how it is processed, etc.
             Default: False (Do not debug)
+        checkpoint: bool
+            Should this run resume from the prior run if the prior run was stopped
+            before finishing and used the exact same parameters. Units of work run
+            with `self.manifest_writer.process_units` that were completed by the prior
+            run are skipped.
+            Default: False (Do not resume, always start from scratch)
+        memoize: bool
+            Should this run be skipped if a prior run with the same parameters,
+            upstream manifests, step source code (and the source of any project modules
+            it imports), and datastep version produced a manifest that is still
+            available locally or in the registry. The prior result and manifest are
+            restored instead of running. Only JSON serializable results are memoized.
+            A clean run can only be restored from the registry.
+            Default: False (Always run)
+        profile: Union[bool, str]
+            Should this run be profiled. The profile is stored in the step local
+            staging directory as "run_profile.txt" plus "run_profile.prof" (cProfile)
+            or "run_profile.html" (pyinstrument). True uses pyinstrument if it is
+            installed and cProfile otherwise, "cprofile" or "pyinstrument" selects one.
+            Default: False (Do not profile)
 
         Returns
         -------
@@ -377,6 +596,22 @@ class Step(Task):
         # The user should set `self.manifest` to a dataframe of absolute paths that
         # point to the created files and each files metadata
         #
+        # To process partitions of an input manifest in parallel, use
+        # `self.map_partitions`, the manifest shards produced by each partition
+        # are merged into `self.manifest` automatically
+        #
+        # Alternatively, for long running steps, register each file (or batch of
+        # files) as it is created with `self.manifest_writer.append` (or `extend`)
+        # Processing units of work with `self.manifest_writer.process_units` allows a
+        # checkpointed run to skip any unit that was completed before a crash,
+        # example:
+        #
+        # def process_fov(fov_id):
+        #     ...
+        #     return fov_rows
+        #
+        # self.manifest_writer.process_units(process_fov, fov_ids)
+        #
         # By default, `self.filepath_columns` is ["filepath"], but should be edited
         # if there are more than a single column of filepaths
         #
@@ -407,14 +642,211 @@ class Step(Task):
 
         Notes
         -----
-        This will always return the first item that matches this step.
-        What this means for the user is that if this step was used in a mapped task,
-        you would only recieve the result of the first iteration of that map.
+        This will always return the result of the first task that matches this step.
+        If that task was mapped, the result is a list of the results of each
+        iteration of the map, in map index order.
+        """
+        task_state = state.result[flow.get_tasks(name=self.step_name)[0]]
+        if isinstance(task_state, prefect.engine.state.Mapped):
+            return [map_state.result for map_state in task_state.map_states]
+
+        return task_state.result
 
-        Generally though, you shouldn't be using these steps in mapped tasks.
-        (It's on our to-do list...)
+    def get_partition_staging_dir(self, index: Optional[int] = None) -> Path:
         """
-        return state.result[flow.get_tasks(name=self.step_name)[0]].result
+        A preconfigured sub-directory of the step local staging directory for a single
+        partition of a partitioned run to store output files in.
+
+        Parameters
+        ----------
+        index: Optional[int]
+            The partition index.
+            Default: the map index of the currently running mapped prefect task
+
+        Returns
+        -------
+        partition_staging_dir: Path
+            The created partition staging directory.
+        """
+        if index is None:
+            index = prefect.context.get("map_index")
+            if index is None:
+                raise ValueError(
+                    "No partition index provided and not running in a mapped task."
+                )
+
+        partition_dir = run_utils.get_partition_dir(self.step_local_staging_dir, index)
+        partition_dir.mkdir(parents=True, exist_ok=True)
+        return partition_dir
+
+    def merge_partition_manifests(self, n_partitions: Optional[int] = None):
+        """
+        Merge the manifest shards stored in each partition staging directory into the
+        step manifest.
+
+        Useful after running this step as a mapped prefect task where each map
+        iteration stored its manifest shard at
+        `self.get_partition_staging_dir() / "manifest.parquet"`.
+
+        Parameters
+        ----------
+        n_partitions: Optional[int]
+            How many partitions the run had, only the shards of partitions 0 to
+            n_partitions - 1 are merged.
+            Default: None (Merge every stored shard, including any left by an earlier
+            run that had more partitions)
+        """
+        import pandas as pd
+
+        partitions_dir = self.step_local_staging_dir / "partitions"
+        shard_paths = sorted(partitions_dir.glob("partition-*/manifest.parquet"))
+        if n_partitions is not None:
+            shard_paths = [
+                run_utils.get_partition_dir(self.step_local_staging_dir, i)
+                / "manifest.parquet"
+                for i in range(n_partitions)
+            ]
+            shard_paths = [
+                shard_path for shard_path in shard_paths if shard_path.is_file()
+            ]
+
+        for shard_path in shard_paths:
+            unit = shard_path.parent.name
+            if not self.manifest_writer.is_complete(unit):
+                self.manifest_writer.extend(pd.read_parquet(shard_path), unit=unit)
+
+        # Reassemble the manifest from the merged rows
+        self.manifest_writer.flush()
+        self.manifest = None
+
+    def map_partitions(
+        self,
+        func: Callable,
+        manifest: "pd.DataFrame",
+        n_partitions: Optional[int] = None,
+        distributed_executor_address: Optional[str] = None,
+        **kwargs,
+    ):
+        """
+        Process partitions of an input manifest in parallel and merge the produced
+        manifest shards into the step manifest.
+
+        Parameters
+        ----------
+        func: Callable
+            A module level (picklable) function to run for each partition. It will be
+            called as `func(partition, partition_staging_dir, **kwargs)` and should
+            store its output files in the provided partition staging directory and
+            return a manifest shard dataframe of those files (or None).
+        manifest: pd.DataFrame
+            The input manifest to partition by row.
+        n_partitions: Optional[int]
+            How many partitions to split the manifest into.
+            Default: the number of CPUs available
+        distributed_executor_address: Optional[str]
+            An optional Dask scheduler address to process the partitions with.
+            Default: None (use a local process pool)
+        kwargs: Any
+            Any extra keyword arguments to pass to each call of func.
+
+        Notes
+        -----
+        Each completed partition is registered as a unit with the manifest writer so
+        a checkpointed run will skip partitions that were completed before a crash.
+        A resumed run splits the manifest the same way as the run it resumes,
+        regardless of n_partitions.
+        """
+        if n_partitions is None:
+            n_partitions = os.cpu_count() or 1
+
+        # Resuming must split the manifest exactly like the run being resumed, whatever
+        # the number of CPUs available now, otherwise units would map to other rows
+        partitions_dir = self.step_local_staging_dir / "partitions"
+        plan_path = partitions_dir / "plan.json"
+        resuming = any(
+            unit.startswith("partition-")
+            for unit in self.manifest_writer.completed_units
+        )
+        if resuming and plan_path.is_file():
+            with open(plan_path, "r") as read_in:
+                plan = json.load(read_in)
+            if plan["n_rows"] != len(manifest):
+                raise ValueError(
+                    f"Can't resume the partitioned run, the manifest has "
+                    f"{len(manifest)} rows but the run being resumed had "
+                    f"{plan['n_rows']}."
+                )
+            log.info(f"Resuming with the partition plan of the prior run: {plan}")
+        else:
+            # Partitions left by an earlier run would be merged with this run's
+            if partitions_dir.is_dir():
+                file_utils._clean(partitions_dir)
+            partitions_dir.mkdir(parents=True, exist_ok=True)
+            plan = {
+                "n_rows": len(manifest),
+                "partition_size": max(math.ceil(len(manifest) / n_partitions), 1),
+            }
+            with open(plan_path, "w") as write_out:
+                json.dump(plan, write_out)
+
+        # Split the manifest by row and skip any partitions already completed
+        partition_size = plan["partition_size"]
+        partitions = {
+            f"partition-{i:06d}": (
+                manifest.iloc[start : start + partition_size],
+                run_utils.get_partition_dir(self.step_local_staging_dir, i),
+            )
+            for i, start in enumerate(range(0, len(manifest), partition_size))
+        }
+        partitions = {
+            unit: partition
+            for unit, partition in partitions.items()
+            if not self.manifest_writer.is_complete(unit)
+        }
+        log.info(f"Processing {len(partitions)} manifest partitions.")
+
+        # Process each partition
+        # Shards are merged in partition order as they complete so that a crash keeps
+        # every partition completed before it
+        if distributed_executor_address is not None:
+            from distributed import Client
+
+            client = Client(distributed_executor_address)
+            try:
+                futures = [
+                    client.submit(run_utils.run_partition, func, data, dirpath, kwargs)
+                    for data, dirpath in partitions.values()
+                ]
+                for unit, future in zip(partitions, futures):
+                    self._merge_partition_shard(unit, future.result())
+            finally:
+                client.close()
+        else:
+            n_workers = min(n_partitions, os.cpu_count() or 1)
+            with ProcessPoolExecutor(max_workers=n_workers) as exe:
+                shard_paths = exe.map(
+                    run_utils.run_partition,
+                    [func] * len(partitions),
+                    [data for data, dirpath in partitions.values()],
+                    [dirpath for data, dirpath in partitions.values()],
+                    [kwargs] * len(partitions),
+                )
+                for unit, shard_path in zip(partitions, shard_paths):
+                    self._merge_partition_shard(unit, shard_path)
+
+        # Reassemble the manifest from the merged rows
+        self.manifest = None
+
+    def _merge_partition_shard(self, unit: str, shard_path: Optional[Path]):
+        import pandas as pd
+
+        if shard_path is None:
+            self.manifest_writer.complete(unit)
+        else:
+            self.manifest_writer.extend(pd.read_parquet(shard_path), unit=unit)
+
+        # Store every partition as soon as it completes
+        self.manifest_writer.flush()
 
     def pull(self, data_version: Optional[str] = None, bucket: Optional[str] = None):
         """
@@ -434,19 +866,20 @@ class Step(Task):
             bucket = self._storage_bucket
 
         # Run checkout for each upstream
-        for UpstreamTask in self._upstream_tasks:
-            upstream_task = UpstreamTask()
-            upstream_task.checkout(data_version=data_version, bucket=bucket)
+        # Each checkout is recorded as a part of this pull
+        with metrics.operation("pull", record_dir=self.step_local_staging_dir):
+            for UpstreamTask in self._upstream_tasks:
+                upstream_task = UpstreamTask()
+                upstream_task.checkout(data_version=data_version, bucket=bucket)
 
     @staticmethod
     def _get_current_git_branch() -> str:
-        repo = git.Repo(Path(".").expanduser().resolve())
+        repo = _get_git_repo()
         return repo.active_branch.name
 
     @staticmethod
     def _check_git_status_is_clean(push_target: str) -> Optional[Exception]:
-        # This will throw an error if the current working directory is not a git repo
-        repo = git.Repo(Path(".").expanduser().resolve())
+        repo = _get_git_repo()
         current_branch = repo.active_branch.name
 
         # Check current git status
@@ -484,8 +917,7 @@ class Step(Task):
 
     @staticmethod
     def _create_data_commit_message() -> str:
-        # This will throw an error if the current working directory is not a git repo
-        repo = git.Repo(Path(".").expanduser().resolve())
+        repo = _get_git_repo()
         current_branch = repo.active_branch.name
 
         return (
@@ -495,8 +927,7 @@ class Step(Task):
 
     @staticmethod
     def _get_git_origin_url() -> str:
-        # This will throw an error if the current working directory is not a git repo
-        repo = git.Repo(Path(".").expanduser().resolve())
+        repo = _get_git_repo()
 
         # Get origin info
         origin = repo.remotes.origin
@@ -510,8 +941,7 @@ class Step(Task):
 
     @staticmethod
     def _get_current_git_commit_hash() -> str:
-        # This will throw an error if the current working directory is not a git repo
-        repo = git.Repo(Path(".").expanduser().resolve())
+        repo = _get_git_repo()
         return repo.head.object.hexsha
 
     def manifest_filepaths_rel2abs(self):
@@ -548,40 +978,287 @@ class Step(Task):
         bucket: Optional[str]
             Request data from a specific bucket different from the bucket defined
             by your workflow_config.json or the defaulted bucket.
+
+        Notes
+        -----
+        `self.manifest` is replaced by the checked out manifest, with filepaths
+        resolved to the step local staging directory.
         """
+        import pandas as pd
+        import quilt3
+
         # Resolve None bucket
         if bucket is None:
             bucket = self._storage_bucket
 
-        # Get current git branch
-        current_branch = self._get_current_git_branch()
+        with metrics.operation(
+            "checkout", record_dir=self.step_local_staging_dir
+        ) as record:
+            # Get current git branch
+            with metrics.phase("git_checks"):
+                current_branch = self._get_current_git_branch()
 
-        # Normalize branch name
-        # This is to stop quilt from making extra directories from names like:
-        # feature/some-feature
-        current_branch = current_branch.replace("/", ".")
+            # Normalize branch name
+            # This is to stop quilt from making extra directories from names like:
+            # feature/some-feature
+            current_branch = current_branch.replace("/", ".")
 
-        # Checkout this step's output from quilt
-        # Check for files on this branch and default to master
+            # Checkout this step's output from quilt
+            # Check for files on this branch and default to master
 
-        # Browse top level project package
-        quilt_loc = f"{self._quilt_package_owner}/{self._quilt_package_name}"
-        p = quilt3.Package.browse(quilt_loc, bucket, top_hash=data_version)
+            # Browse top level project package
+            with metrics.phase("browse"):
+                quilt_loc = f"{self._quilt_package_owner}/{self._quilt_package_name}"
+                p = quilt3.Package.browse(quilt_loc, bucket, top_hash=data_version)
+
+            # Check to see if step data exists on this branch in quilt
+            try:
+                quilt_branch_step = f"{current_branch}/{self.step_name}"
+                p[quilt_branch_step]
+
+            # If not, use the version on master
+            except KeyError:
+                quilt_branch_step = f"master/{self.step_name}"
+                p[quilt_branch_step]
+
+            # Record the size of the data being fetched
+            record.update(quilt_utils.get_package_stats(p[quilt_branch_step]))
+
+            # Fetch the data and save it to the local staging dir
+            # Transfers adapt their concurrency and retry when throttled
+            with metrics.phase("fetch"):
+                quilt_utils.fetch_package(
+                    p[quilt_branch_step],
+                    self.step_local_staging_dir,
+                    controller=transfer.get_controller(bucket, self._transfer_config),
+                )
 
-        # Check to see if step data exists on this branch in quilt
+            # Decompress any files that were compressed on push
+            # Shards are decompressed before they are unbundled
+            quilt_utils.decompress_package_files(
+                p[quilt_branch_step], self.step_local_staging_dir
+            )
+
+            # Restore any small files that were bundled on push
+            with metrics.phase("unbundle"):
+                bundle_utils.unbundle(self.step_local_staging_dir)
+
+        # Rows registered by a prior local run would take precedence over the checked
+        # out manifest, drop them
+        self.manifest_writer.reset()
+
+        # Replace the manifest read prior to the checkout with the checked out one
+        # Paths are stored relative to the step local staging dir
+        self.manifest = pd.read_parquet(
+            self.step_local_staging_dir / "manifest.parquet"
+        )
+        self.manifest_filepaths_rel2abs()
+
+        # Drop any index read prior to the checkout
+        self._manifest_index = None
+
+    def _get_run_memo_key(self, params: Dict[str, Any]) -> str:
+        # Find the manifests of each upstream to identify the upstream data
+        upstream_manifests = {}
+        for upstream_task in self._upstream_tasks:
+            if isinstance(upstream_task, str):
+                upstream_manifests[upstream_task] = run_utils.find_manifest(
+                    self._project_local_staging_dir / upstream_task
+                )
+            else:
+                if isinstance(upstream_task, type):
+                    upstream_task = upstream_task()
+                upstream_manifests[upstream_task.step_name] = run_utils.find_manifest(
+                    upstream_task.step_local_staging_dir
+                )
+
+        # Prefer the step source over the git commit so that changes to other steps
+        # don't invalidate this step's prior runs
+        code_version = run_utils.get_source_hash(self.__class__)
+        if code_version is None:
+            code_version = self._get_current_git_commit_hash()
+
+        return run_utils.create_run_memo_key(
+            params=params,
+            upstream_manifests=upstream_manifests,
+            code_version=code_version,
+            datastep_version=get_module_version(),
+        )
+
+    def _read_run_result(self) -> Any:
+        with open(self.step_local_staging_dir / "run_result.json", "r") as read_in:
+            return json.load(read_in)
+
+    def _restore_memoized_run(self, memo_key: str) -> Tuple[bool, Any]:
+        # Check for a matching memo from a prior local run
+        memo_store = self.step_local_staging_dir / "run_memo.json"
+        if memo_store.is_file():
+            with open(memo_store, "r") as read_in:
+                local_key = json.load(read_in)["key"]
+
+            if (
+                local_key == memo_key
+                and (self.step_local_staging_dir / "run_result.json").is_file()
+                and self.manifest is not None
+                and run_utils.manifest_files_exist(self.manifest, self.filepath_columns)
+            ):
+                return True, self._read_run_result()
+
+        # Check for a matching memo from a pushed run on this branch
+        import botocore
+        import git
+        import quilt3
+
+        # Outside a git repo, on a detached HEAD (TypeError), or without access to
+        # the registry there is no pushed run to find, run instead
+        quilt_loc = f"{self._quilt_package_owner}/{self._quilt_package_name}"
         try:
-            quilt_branch_step = f"{current_branch}/{self.step_name}"
-            p[quilt_branch_step]
+            current_branch = self._get_current_git_branch().replace("/", ".")
+            top_hash = quilt_utils.get_latest_top_hash(quilt_loc, self._storage_bucket)
+        except (
+            git.exc.InvalidGitRepositoryError,
+            git.exc.NoSuchPathError,
+            TypeError,
+            botocore.exceptions.BotoCoreError,
+            botocore.exceptions.ClientError,
+        ) as e:
+            log.debug(f"Could not look up a pushed run memo for {quilt_loc}: {e!r}")
+            return False, None
+
+        if top_hash is None:
+            log.debug(f"No pushed package found for: {quilt_loc}")
+            return False, None
+
+        step_prefix = f"{current_branch}/{self.step_name}"
+        try:
+            p = quilt3.Package.browse(
+                quilt_loc, self._storage_bucket, top_hash=top_hash
+            )
+            remote_key = p[f"{step_prefix}/run_memo.json"].deserialize()["key"]
+
+            # Runs memoized before results were stored as JSON can't be restored
+            p[f"{step_prefix}/run_result.json"]
+        except (
+            KeyError,
+            botocore.exceptions.BotoCoreError,
+            botocore.exceptions.ClientError,
+        ):
+            log.debug(f"No pushed run memo found for: {quilt_loc}/{current_branch}")
+            return False, None
+
+        if remote_key != memo_key:
+            return False, None
+
+        # Restore the pushed run
+        self.checkout()
+
+        return True, self._read_run_result()
+
+    def _get_manifest_index(self) -> Dict[str, Any]:
+        # Read and cache the index produced during push
+        if self._manifest_index is None:
+            index_path = file_utils.resolve_filepath(
+                self.step_local_staging_dir / "manifest_index.json"
+            )
+            with open(index_path, "r") as read_in:
+                self._manifest_index = json.load(read_in)
+            log.debug(f"Read manifest index from file: {index_path}")
 
-        # If not, use the version on master
-        except KeyError:
-            quilt_branch_step = f"master/{self.step_name}"
-            p[quilt_branch_step]
+        return self._manifest_index
 
-        # Fetch the data and save it to the local staging dir
-        p[quilt_branch_step].fetch(self.step_local_staging_dir)
+    def get_manifest_rows(self, logical_key: str) -> List[Tuple[int, str]]:
+        """
+        Find which manifest rows reference a file.
 
-    def push(self, bucket: Optional[str] = None):
+        Parameters
+        ----------
+        logical_key: str
+            The logical key of the file in the step package.
+            Ex: "images/some_file.tiff"
+
+        Returns
+        -------
+        references: List[Tuple[int, str]]
+            The (row, filepath column) pairs that reference the file. Rows are
+            positional indices into the checked out relative manifest.
+
+        Notes
+        -----
+        This uses the manifest_index.json stored alongside the manifest during push,
+        so it is only available after a checkout of data pushed with the index.
+        """
+        lookup = self._get_manifest_index()["logical_keys"].get(logical_key)
+        if lookup is None:
+            raise KeyError(logical_key)
+
+        return list(zip(lookup["rows"], lookup["columns"]))
+
+    def _get_manifest_row_indices(self, logical_key: str) -> List[int]:
+        # A row that references the file from many filepath columns is only returned
+        # once, in the order the rows were first referenced
+        return list(
+            dict.fromkeys(row for row, col in self.get_manifest_rows(logical_key))
+        )
+
+    def get_associates(self, logical_key: str) -> List[Dict[str, str]]:
+        """
+        Get the associated files for each manifest row that references a file.
+
+        Parameters
+        ----------
+        logical_key: str
+            The logical key of the file in the step package.
+            Ex: "images/some_file.tiff"
+
+        Returns
+        -------
+        associates: List[Dict[str, str]]
+            For each row that references the file, a mapping of filepath column to
+            the logical key stored in that column.
+        """
+        index = self._get_manifest_index()
+        return [
+            index["associates"][row]
+            for row in self._get_manifest_row_indices(logical_key)
+        ]
+
+    def get_metadata(self, logical_key: str) -> Dict[str, List[Any]]:
+        """
+        Get the metadata of every manifest row that references a file.
+
+        Parameters
+        ----------
+        logical_key: str
+            The logical key of the file in the step package.
+            Ex: "images/some_file.tiff"
+
+        Returns
+        -------
+        metadata: Dict[str, List[Any]]
+            For each metadata column, the values of every row that references the
+            file, plus the "associates" of each of those rows.
+
+        Notes
+        -----
+        This joins the checked out manifest with the manifest index, so it works the
+        same for data pushed with or without `sidecar_metadata`.
+        """
+        rows = self._get_manifest_row_indices(logical_key)
+        metadata = self.manifest.iloc[rows][self.metadata_columns].to_dict("list")
+        metadata["associates"] = self.get_associates(logical_key)
+
+        return metadata
+
+    def push(
+        self,
+        bucket: Optional[str] = None,
+        include_profile: bool = False,
+        validate: bool = True,
+        sidecar_metadata: bool = False,
+        bundle_threshold: Optional[int] = None,
+        compress_columns: List[str] = [],
+        compress_extensions: List[str] = [],
+    ):
         """
         Push the most recently generated data.
 
@@ -590,36 +1267,155 @@ class Step(Task):
         bucket: Optional[str]
             Push data to a specific bucket different from the bucket defined
             by your workflow_config.json or the defaulted bucket.
+        include_profile: bool
+            Should the profile of the most recent run be included in the package.
+            Default: False (Do not include)
+        validate: bool
+            Should the manifest be validated while the package is constructed. Missing
+            files and columns are reported before anything is uploaded.
+            Default: True (Validate)
+        sidecar_metadata: bool
+            Should package entries only store the metadata values that reduce to a
+            single value. The full metadata and associates of every file are still
+            available after checkout with `get_metadata` and `get_associates`, which
+            read them from the stored manifest. This keeps the package manifest small
+            and fast to browse for steps where many rows reference the same file.
+            Default: False (Store all metadata and associates on package entries)
+        bundle_threshold: Optional[int]
+            Pack every step file smaller than this many bytes into a few large shard
+            files to avoid the per-object overhead of uploading and downloading
+            millions of tiny files. Checkout restores bundled files under their
+            original logical keys.
+            Default: None (Do not bundle)
+        compress_columns: List[str]
+            Filepath columns whose files should be compressed with zstd prior to
+            upload. Checkout decompresses them transparently. Requires the zstandard
+            package (`pip install datastep[compression]`).
+            Default: [] (Do not compress by column)
+        compress_extensions: List[str]
+            File extensions that should be compressed with zstd prior to upload.
+            Ex: [".tiff", ".csv"]
+            Default: [] (Do not compress by extension)
 
         Notes
         -----
         If your git status isn't clean, or you haven't commited and pushed to
         origin, any attempt to push data will be rejected.
+
+        Files are hashed in parallel prior to upload. Setting "hash_workers" in your
+        workflow_config.json controls how many files are hashed at once.
+
+        Uploads adapt their concurrency to the registry and are retried when the
+        registry throttles them. The "transfer" object of your workflow_config.json
+        configures this. Ex: {"transfer": {"initial": 8, "maximum": 64}}
+
+        Steps can push to the same project package in parallel. Step files are
+        uploaded first, then the project package is published only if no other step
+        published since it was browsed, otherwise this step's data is rebased onto the
+        newer revision. Setting "push_attempts" in your workflow_config.json controls
+        how many times publishing is attempted.
+
+        Files whose content matches a versioned file already stored in the project
+        package, from a prior version of this step or from another step, are not
+        uploaded again, the new entry points at the existing copy.
         """
-        # Check if manifest is None
-        if self.manifest is None:
-            raise exceptions.PackagingError(
-                "No manifest found to construct package with."
-            )
+        with metrics.operation(
+            "push", record_dir=self.step_local_staging_dir
+        ) as record:
+            # Check if manifest is None
+            if self.manifest is None:
+                raise exceptions.PackagingError(
+                    "No manifest found to construct package with."
+                )
 
-        # Resolve None bucket
-        if bucket is None:
-            bucket = self._storage_bucket
+            # Catch a bad column prior to any git checks or package construction
+            self._check_compress_columns(compress_columns)
+
+            # Resolve None bucket
+            if bucket is None:
+                bucket = self._storage_bucket
+
+            with metrics.phase("git_checks"):
+                # Get current git branch
+                current_branch = self._get_current_git_branch()
+
+                # Normalize branch name
+                # This is to stop quilt from making extra directories from names like:
+                # feature/some-feature
+                current_branch = current_branch.replace("/", ".")
+
+                # Resolve push target
+                quilt_loc = f"{self._quilt_package_owner}/{self._quilt_package_name}"
+                push_target = f"{quilt_loc}/{current_branch}/{self.step_name}"
+
+                # Check git status is clean
+                self._check_git_status_is_clean(push_target)
+
+            # Construct the package and any supporting files
+            with TemporaryDirectory() as tempdir:
+                step_pkg = self._build_push_package(
+                    Path(tempdir),
+                    readme=self._render_readme(),
+                    include_profile=include_profile,
+                    validate=validate,
+                    sidecar_metadata=sidecar_metadata,
+                    bundle_threshold=bundle_threshold,
+                    compress_columns=compress_columns,
+                    compress_extensions=compress_extensions,
+                )
 
-        # Get current git branch
-        current_branch = self._get_current_git_branch()
+                # Record the size of the data being pushed
+                record.update(quilt_utils.get_package_stats(step_pkg))
+
+                # Upload and publish to the step's branch / step directory
+                _publish_step_packages(
+                    {f"{current_branch}/{self.step_name}": step_pkg},
+                    quilt_loc=quilt_loc,
+                    registry=self._storage_bucket,
+                    message=self._create_data_commit_message(),
+                    hash_workers=self._hash_workers,
+                    transfer_config=self._transfer_config,
+                    push_attempts=self._push_attempts,
+                )
 
-        # Normalize branch name
-        # This is to stop quilt from making extra directories from names like:
-        # feature/some-feature
-        current_branch = current_branch.replace("/", ".")
+    def _check_compress_columns(self, compress_columns: List[str]):
+        # Files are compressed by the logical keys stored in filepath columns
+        for col in compress_columns:
+            if col not in self.manifest.columns:
+                raise ValueError(
+                    f"Could not find compress column: '{col}' "
+                    f"in manifest columns: {self.manifest.columns}"
+                )
+            if col not in self.filepath_columns:
+                raise ValueError(
+                    f"Compress column: '{col}' is not one of the filepath columns: "
+                    f"{self.filepath_columns}"
+                )
 
-        # Resolve push target
-        quilt_loc = f"{self._quilt_package_owner}/{self._quilt_package_name}"
-        push_target = f"{quilt_loc}/{current_branch}/{self.step_name}"
+    def _render_readme(self) -> str:
+        with metrics.phase("readme"):
+            return constants.README_TEMPLATE.render(
+                quilt_package_name=self._quilt_package_name,
+                source_url=self._get_git_origin_url(),
+                branch_name=self._get_current_git_branch(),
+                commit_hash=self._get_current_git_commit_hash(),
+                creator=getpass.getuser(),
+            )
 
-        # Check git status is clean
-        self._check_git_status_is_clean(push_target)
+    def _build_push_package(
+        self,
+        dirpath: Path,
+        readme: str,
+        include_profile: bool = False,
+        validate: bool = True,
+        sidecar_metadata: bool = False,
+        bundle_threshold: Optional[int] = None,
+        compress_columns: List[str] = [],
+        compress_extensions: List[str] = [],
+    ) -> "Package":
+        # Generated files are stored in dirpath, it must exist until the package is
+        # uploaded
+        dirpath.mkdir(parents=True, exist_ok=True)
 
         # Construct the package
         step_pkg, relative_manifest = quilt_utils.create_package(
@@ -627,75 +1423,272 @@ class Step(Task):
             step_pkg_root=self.step_local_staging_dir,
             filepath_columns=self.filepath_columns,
             metadata_columns=self.metadata_columns,
+            validate=validate,
+            sidecar_metadata=sidecar_metadata,
         )
 
+        # Pack small step files into shards before any supporting files are added so
+        # that only step data is bundled
+        if bundle_threshold is not None:
+            step_pkg = quilt_utils.bundle_package(step_pkg, dirpath, bundle_threshold)
+
+        # Compress the selected step files
+        if len(compress_columns) > 0 or len(compress_extensions) > 0:
+            step_pkg = quilt_utils.compress_package(
+                step_pkg,
+                dirpath / "compressed",
+                relative_manifest,
+                columns=compress_columns,
+                extensions=compress_extensions,
+            )
+
         # Add the relative manifest and generated README to the package
-        with TemporaryDirectory() as tempdir:
-            # Store the relative manifest in a temporary directory
-            m_path = Path(tempdir) / "manifest.parquet"
+        with metrics.phase("supporting_files"):
+            # Store the relative manifest in the generated files directory
+            m_path = dirpath / "manifest.parquet"
             relative_manifest.to_parquet(m_path)
             step_pkg.set("manifest.parquet", m_path)
 
+            # Store the logical key lookup index next to the relative manifest
+            index_path = dirpath / "manifest_index.json"
+            with open(index_path, "w") as write_out:
+                json.dump(
+                    quilt_utils.create_manifest_index(
+                        relative_manifest, self.filepath_columns
+                    ),
+                    write_out,
+                )
+            step_pkg.set("manifest_index.json", index_path)
+
             # Add the params files to the package
-            for param_file in ["run_parameters.json", "init_parameters.json"]:
+            for param_file in [
+                "run_parameters.json",
+                "init_parameters.json",
+            ]:
                 param_file_path = self.step_local_staging_dir / param_file
                 step_pkg.set(param_file, param_file_path)
 
-            # Generate README
-            readme_path = Path(tempdir) / "README.md"
+            # Add the stats, memo, and timings of the run
+            for optional_file in [
+                "run_stats.json",
+                "run_memo.json",
+                "run_result.json",
+                "timings.json",
+            ]:
+                optional_file_path = self.step_local_staging_dir / optional_file
+                if optional_file_path.is_file():
+                    step_pkg.set(optional_file, optional_file_path)
+
+            # Add the profile of the run
+            if include_profile:
+                for artifact in run_utils.PROFILE_ARTIFACTS:
+                    artifact_path = self.step_local_staging_dir / artifact
+                    if artifact_path.is_file():
+                        step_pkg.set(artifact, artifact_path)
+
+            # Add the README
+            readme_path = dirpath / "README.md"
             with open(readme_path, "w") as write_readme:
-                write_readme.write(
-                    constants.README_TEMPLATE.render(
-                        quilt_package_name=self._quilt_package_name,
-                        source_url=self._get_git_origin_url(),
-                        branch_name=self._get_current_git_branch(),
-                        commit_hash=self._get_current_git_commit_hash(),
-                        creator=getpass.getuser(),
-                    )
-                )
+                write_readme.write(readme)
             step_pkg.set("README.md", readme_path)
 
-            # Browse top level project package and add / overwrite to it in step dir
-            try:
-                project_pkg = quilt3.Package.browse(quilt_loc, self._storage_bucket)
-            except botocore.errorfactory.ClientError:
-                log.info(
-                    f"Could not find existing package: {quilt_loc} "
-                    f"in bucket: {self._storage_bucket}. "
-                    f"Creating a new package."
+        return step_pkg
+
+    @staticmethod
+    def _merge_step_package(
+        project_pkg: "Package", step_prefix: str, step_pkg: "Package"
+    ) -> "Package":
+        # Remove the current step if it exists in the previous project package
+        try:
+            project_pkg[step_prefix]
+            project_pkg = project_pkg.delete(step_prefix)
+        except KeyError:
+            pass
+
+        # Merge packages
+        for (logical_key, pkg_entry) in step_pkg.walk():
+            project_pkg.set(f"{step_prefix}/{logical_key}", pkg_entry)
+
+        return project_pkg
+
+    @staticmethod
+    def _has_step_package(
+        project_pkg: "Package", step_prefix: str, step_hashes: Dict[str, Optional[str]]
+    ) -> bool:
+        # The project package holds exactly this step's data under its prefix
+        try:
+            subtree = project_pkg[step_prefix]
+        except KeyError:
+            return False
+
+        return quilt_utils.get_entry_hashes(subtree) == step_hashes
+
+    def promote(self, source_branch: str, target_branch: str = "master"):
+        """
+        Promote the data this step pushed on one branch to another branch without
+        uploading anything from the local staging directory.
+
+        The target branch directory reuses the versioned files and hashes already
+        stored for the source branch, only a new revision of the project package
+        manifest is published. Promotion takes the same time regardless of how much
+        data the step produced. Files stored without a version id are copied within
+        the registry instead, as the next push of the source branch would overwrite
+        them.
+
+        Parameters
+        ----------
+        source_branch: str
+            The git branch the data was pushed from. Ex: "feature/new-filter"
+        target_branch: str
+            The git branch to place the data under.
+            Default: "master"
+        """
+        import quilt3
+
+        with metrics.operation(
+            "promote", record_dir=self.step_local_staging_dir
+        ) as record:
+            # Normalize branch names the same way push does
+            source_branch = source_branch.replace("/", ".")
+            target_branch = target_branch.replace("/", ".")
+            if source_branch == target_branch:
+                raise ValueError(
+                    f"Source and target branch are the same: '{source_branch}'."
                 )
-                project_pkg = quilt3.Package()
 
-            # Regardless of if we found a prior version of the package or starting from
-            # a new package, we "merge" them together to place this steps data in the
-            # correct location.
+            # Find the data pushed from the source branch
+            quilt_loc = f"{self._quilt_package_owner}/{self._quilt_package_name}"
+            source_prefix = f"{source_branch}/{self.step_name}"
+            target_prefix = f"{target_branch}/{self.step_name}"
+            with metrics.phase("browse"):
+                top_hash = quilt_utils.get_latest_top_hash(
+                    quilt_loc, self._storage_bucket
+                )
+                if top_hash is None:
+                    raise exceptions.PackagingError(
+                        f"Could not find existing package: {quilt_loc} "
+                        f"in bucket: {self._storage_bucket}."
+                    )
 
-            # Remove the current step if it exists in the previous project package
-            if current_branch in project_pkg.keys():
-                if self.step_name in project_pkg[current_branch].keys():
-                    project_pkg = project_pkg.delete(
-                        f"{current_branch}/{self.step_name}"
+                project_pkg = quilt3.Package.browse(
+                    quilt_loc, self._storage_bucket, top_hash=top_hash
+                )
+                try:
+                    source_pkg = project_pkg[source_prefix]
+                except KeyError:
+                    raise exceptions.PackagingError(
+                        f"No data found for step: {self.step_name} on branch: "
+                        f"{source_branch} in package: {quilt_loc}."
                     )
 
-            # Merge packages
-            for (logical_key, pkg_entry) in step_pkg.walk():
-                project_pkg.set(
-                    f"{current_branch}/{self.step_name}/{logical_key}", pkg_entry
+            # Record the size of the data being promoted
+            record.update(quilt_utils.get_package_stats(source_pkg))
+
+            # Versioned entries keep their physical keys and hashes
+            # Unversioned objects (from registries without versioning) would be
+            # overwritten by the next push of the source branch, copy them into the
+            # target branch directory instead
+            with metrics.phase("copy_unversioned"):
+                target_pkg = quilt_utils.upload_package(
+                    source_pkg,
+                    f"{self._storage_bucket}/{quilt_loc}/{target_prefix}",
+                    controller=transfer.get_controller(
+                        self._storage_bucket, self._transfer_config
+                    ),
                 )
 
-            # Push the data
-            project_pkg.push(
-                quilt_loc,
+            _publish_step_subtrees(
+                {target_prefix: target_pkg},
+                quilt_loc=quilt_loc,
                 registry=self._storage_bucket,
-                message=self._create_data_commit_message(),
+                message=(
+                    f"data promoted from {source_prefix} to {target_prefix} "
+                    f"at revision {top_hash}"
+                ),
+                push_attempts=self._push_attempts,
             )
 
-    def clean(self) -> str:
+    def clean(self, background: Optional[bool] = None):
         """
         Completely reset this steps local staging directory by removing all previously
         generated files.
+
+        Parameters
+        ----------
+        background: Optional[bool]
+            Should the previously generated files be removed in a background thread.
+            The directory is atomically moved aside and recreated empty so it can be
+            written to immediately, while the old files are removed.
+            Default: None (use the "background_clean" value of your
+            workflow_config.json, which defaults to False)
+
+        Notes
+        -----
+        Setting "clean_workers" in your workflow_config.json removes files with that
+        many parallel workers, which can greatly speed up cleaning on network storage.
+        """
+        if background is None:
+            background = self._background_clean
+
+        file_utils._clean(
+            self.step_local_staging_dir,
+            background=background,
+            n_workers=self._clean_workers,
+        )
+
+    def clean_unreferenced(self, dry_run: bool = False) -> Dict[str, int]:
         """
-        file_utils._clean(self.step_local_staging_dir)
+        Remove only the files in this steps local staging directory that are not
+        referenced by the current manifest. Files datastep manages (parameters, stats,
+        timings, and the manifest itself) are always kept.
+
+        Useful for reclaiming space from stale outputs of prior runs without having to
+        regenerate everything that is still in use.
+
+        Parameters
+        ----------
+        dry_run: bool
+            Only report what would be removed, don't remove anything.
+            Default: False
+
+        Returns
+        -------
+        reclaimed: Dict[str, int]
+            The number of files removed ("files") and the bytes reclaimed ("bytes").
+        """
+        if self.manifest is None:
+            raise exceptions.PackagingError(
+                "No manifest found to determine which files are referenced. "
+                "Use `clean` to remove all generated files instead."
+            )
+
+        referenced = set()
+        for col in self.filepath_columns:
+            if col in self.manifest.columns:
+                referenced.update(str(f) for f in self.manifest[col].unique())
+
+        # Partition shards that haven't been merged yet and the partition plan are
+        # still needed to resume
+        referenced.update(
+            self.step_local_staging_dir.glob("partitions/partition-*/manifest.parquet")
+        )
+        referenced.update(self.step_local_staging_dir.glob("partitions/plan.json"))
+
+        with metrics.operation("clean_unreferenced") as record:
+            files_removed, bytes_reclaimed = file_utils._remove_unreferenced(
+                self.step_local_staging_dir,
+                referenced=referenced,
+                protected=constants.STEP_LOCAL_STAGING_PROTECTED_FILES,
+                dry_run=dry_run,
+            )
+            record.update({"files": files_removed, "bytes": bytes_reclaimed})
+
+        log.info(
+            f"{'Would reclaim' if dry_run else 'Reclaimed'} {bytes_reclaimed} bytes "
+            f"from {files_removed} unreferenced files in: {self.step_local_staging_dir}"
+        )
+
+        return {"files": files_removed, "bytes": bytes_reclaimed}
 
     def __str__(self):
         return (
@@ -709,3 +1702,285 @@ class Step(Task):
 
     def __repr__(self):
         return str(self)
+
+
+def _publish_step_packages(
+    step_pkgs: Dict[str, "Package"],
+    quilt_loc: str,
+    registry: str,
+    message: str,
+    hash_workers: Optional[int] = None,
+    transfer_config: Dict[str, Any] = {},
+    push_attempts: int = constants.DEFAULT_PUSH_ATTEMPTS,
+):
+    import quilt3
+
+    # Combine every step under its branch / step prefix so that all files are hashed
+    # and uploaded together
+    combined = quilt3.Package()
+    for step_prefix, step_pkg in step_pkgs.items():
+        for logical_key, pkg_entry in step_pkg.walk():
+            combined.set(f"{step_prefix}/{logical_key}", pkg_entry)
+
+    # Hash files in parallel so quilt doesn't hash them serially on push
+    quilt_utils.set_package_hashes(combined, n_workers=hash_workers)
+
+    # Browse top level project package at its latest revision
+    # The same browse is used to publish unless another step publishes meanwhile
+    with metrics.phase("browse"):
+        base = _browse_project_package(quilt_loc, registry)
+
+    # Files whose content is already in the project package, in a prior version of
+    # a step or in another step, reuse the existing remote copy
+    with metrics.phase("dedupe") as dedupe_record:
+        base_hash, project_pkg = base
+        if base_hash is not None:
+            dedupe_record.update(
+                quilt_utils.dedupe_package(
+                    combined, quilt_utils.get_remote_keys(project_pkg)
+                )
+            )
+            log.info(
+                f"Reusing {dedupe_record['files']} files ({dedupe_record['bytes']} "
+                f"bytes) already stored in {quilt_loc}."
+            )
+
+    # Upload the step files without publishing a revision
+    # Step files were already hashed, quilt only hashes any remaining
+    # Transfers adapt their concurrency and retry when throttled
+    with metrics.phase("hash_and_upload"):
+        combined = quilt_utils.upload_package(
+            combined,
+            f"{registry}/{quilt_loc}",
+            controller=transfer.get_controller(registry, transfer_config),
+        )
+
+    # Publish every step subtree with its uploaded files
+    _publish_step_subtrees(
+        {step_prefix: combined[step_prefix] for step_prefix in step_pkgs},
+        quilt_loc=quilt_loc,
+        registry=registry,
+        message=message,
+        push_attempts=push_attempts,
+        base=base,
+    )
+
+
+def _browse_project_package(
+    quilt_loc: str, registry: str
+) -> Tuple[Optional[str], "Package"]:
+    import quilt3
+
+    # Return the latest top hash (None if nothing was published) with its package
+    base_hash = quilt_utils.get_latest_top_hash(quilt_loc, registry)
+    if base_hash is None:
+        log.info(
+            f"Could not find existing package: {quilt_loc} "
+            f"in bucket: {registry}. "
+            f"Creating a new package."
+        )
+        return None, quilt3.Package()
+
+    return base_hash, quilt3.Package.browse(quilt_loc, registry, top_hash=base_hash)
+
+
+def _publish_step_subtrees(
+    subtrees: Dict[str, "Package"],
+    quilt_loc: str,
+    registry: str,
+    message: str,
+    push_attempts: int = constants.DEFAULT_PUSH_ATTEMPTS,
+    base: Optional[Tuple[Optional[str], "Package"]] = None,
+):
+    import quilt3
+
+    # Publish with optimistic concurrency, if another step published between
+    # browsing and publishing, rebase the step subtrees onto the new head and try again
+    # Every entry is already remote, publishing only writes a new manifest
+    step_hashes = {
+        step_prefix: quilt_utils.get_entry_hashes(subtree)
+        for step_prefix, subtree in subtrees.items()
+    }
+    for attempt in range(push_attempts):
+        if attempt > 0:
+            delay = transfer.get_backoff_delay(attempt)
+            log.info(
+                f"Project package {quilt_loc} changed while publishing "
+                f"{list(subtrees)}. Rebasing in {delay:.2f} seconds."
+            )
+            time.sleep(delay)
+
+        # Browse top level project package at its latest revision
+        # The first attempt reuses the revision browsed by the caller (if any)
+        if attempt == 0 and base is not None:
+            base_hash, project_pkg = base
+        else:
+            with metrics.phase("browse"):
+                base_hash, project_pkg = _browse_project_package(quilt_loc, registry)
+
+        # Regardless of if we found a prior version of the package or starting from a
+        # new package, we "merge" them together to place each steps data in the
+        # correct location.
+        with metrics.phase("merge"):
+            for step_prefix, subtree in subtrees.items():
+                project_pkg = Step._merge_step_package(
+                    project_pkg, step_prefix, subtree
+                )
+
+        # Publishing only writes the manifest, the files are uploaded
+        with metrics.phase("publish", attempt=attempt):
+            # Another step published since browsing, rebase
+            if quilt_utils.get_latest_top_hash(quilt_loc, registry) != base_hash:
+                continue
+
+            top_hash = project_pkg.build(quilt_loc, registry=registry, message=message)
+
+            # Another step may have published between the check and the build, what
+            # was published must still contain every step
+            latest_hash = quilt_utils.get_latest_top_hash(quilt_loc, registry)
+            if latest_hash == top_hash:
+                return
+
+            latest_pkg = quilt3.Package.browse(
+                quilt_loc, registry, top_hash=latest_hash
+            )
+            if all(
+                Step._has_step_package(latest_pkg, step_prefix, hashes)
+                for step_prefix, hashes in step_hashes.items()
+            ):
+                return
+
+    raise exceptions.PackagingError(
+        f"Failed to publish {list(subtrees)} to {quilt_loc} after {push_attempts} "
+        f"attempts, other steps kept publishing to the project package."
+    )
+
+
+def push_all(
+    steps: List[Step],
+    include_profile: bool = False,
+    validate: bool = True,
+    sidecar_metadata: bool = False,
+    bundle_threshold: Optional[int] = None,
+    compress_columns: List[str] = [],
+    compress_extensions: List[str] = [],
+):
+    """
+    Push the most recently generated data of many steps as a single revision of the
+    project package.
+
+    Git checks, browsing the project package, hashing, and uploading are done once
+    for all steps rather than once per step.
+
+    Parameters
+    ----------
+    steps: List[Step]
+        The steps to push. Every step must push to the same project package.
+    include_profile: bool
+        Should the profile of the most recent run of each step be included.
+        Default: False (Do not include)
+    validate: bool
+        Should each manifest be validated while the packages are constructed.
+        Default: True (Validate)
+    sidecar_metadata: bool
+        Should package entries only store the metadata values that reduce to a
+        single value. See `Step.push` for details.
+        Default: False (Store all metadata and associates on package entries)
+    bundle_threshold: Optional[int]
+        Pack every step file smaller than this many bytes into shard files.
+        Default: None (Do not bundle)
+    compress_columns: List[str]
+        Filepath columns whose files should be compressed with zstd prior to upload.
+        Default: [] (Do not compress by column)
+    compress_extensions: List[str]
+        File extensions that should be compressed with zstd prior to upload.
+        Default: [] (Do not compress by extension)
+
+    Notes
+    -----
+    If your git status isn't clean, or you haven't commited and pushed to
+    origin, any attempt to push data will be rejected.
+
+    The hashing, transfer, and publishing settings of the first step's config are
+    used for the whole push.
+    """
+    if len(steps) == 0:
+        raise ValueError("No steps were provided to push.")
+
+    # Every step must be placed in the same project package exactly once
+    first = steps[0]
+    quilt_loc = f"{first._quilt_package_owner}/{first._quilt_package_name}"
+    step_names = set()
+    for step in steps:
+        step_loc = f"{step._quilt_package_owner}/{step._quilt_package_name}"
+        if step_loc != quilt_loc or step._storage_bucket != first._storage_bucket:
+            raise exceptions.PackagingError(
+                f"All steps must push to the same project package. "
+                f"Step: {step.step_name} pushes to {step._storage_bucket}/{step_loc} "
+                f"while step: {first.step_name} pushes to "
+                f"{first._storage_bucket}/{quilt_loc}."
+            )
+        if step.step_name in step_names:
+            raise exceptions.PackagingError(
+                f"Step: {step.step_name} was provided more than once."
+            )
+        step_names.add(step.step_name)
+
+        # Check if manifest is None
+        if step.manifest is None:
+            raise exceptions.PackagingError(
+                f"No manifest found to construct package with for step: "
+                f"{step.step_name}."
+            )
+        step._check_compress_columns(compress_columns)
+
+    with metrics.operation(
+        "push_all", record_dir=first._project_local_staging_dir, steps=len(steps)
+    ) as record:
+        with metrics.phase("git_checks"):
+            # Get current git branch
+            # Normalize branch name
+            # This is to stop quilt from making extra directories from names like:
+            # feature/some-feature
+            current_branch = first._get_current_git_branch().replace("/", ".")
+
+            # Check git status is clean
+            first._check_git_status_is_clean(f"{quilt_loc}/{current_branch}")
+
+        # Every step shares the same README
+        readme = first._render_readme()
+
+        # Construct every step package and their supporting files
+        with TemporaryDirectory() as tempdir:
+            step_pkgs = {}
+            for step in steps:
+                step_prefix = f"{current_branch}/{step.step_name}"
+                step_pkgs[step_prefix] = step._build_push_package(
+                    Path(tempdir) / step.step_name,
+                    readme=readme,
+                    include_profile=include_profile,
+                    validate=validate,
+                    sidecar_metadata=sidecar_metadata,
+                    bundle_threshold=bundle_threshold,
+                    compress_columns=compress_columns,
+                    compress_extensions=compress_extensions,
+                )
+
+            # Record the size of the data being pushed
+            record["files"] = 0
+            record["bytes"] = 0
+            for step_pkg in step_pkgs.values():
+                stats = quilt_utils.get_package_stats(step_pkg)
+                record["files"] += stats["files"]
+                record["bytes"] += stats["bytes"]
+
+            # Upload and publish every step as a single revision
+            _publish_step_packages(
+                step_pkgs,
+                quilt_loc=quilt_loc,
+                registry=first._storage_bucket,
+                message=first._create_data_commit_message(),
+                hash_workers=first._hash_workers,
+                transfer_config=first._transfer_config,
+                push_attempts=first._push_attempts,
+            )
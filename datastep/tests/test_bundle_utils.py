@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from pathlib import Path
+
+import pytest
+
+from datastep import bundle_utils
+
+###############################################################################
+
+
+@pytest.mark.parametrize("shard_size, expected_shards", [(1, 5), (8, 2), (2 ** 20, 1)])
+def test_bundle_round_trip(tmpdir, shard_size, expected_shards):
+    # Create small files in nested directories
+    source = Path(tmpdir) / "source"
+    members = []
+    for i in range(5):
+        f = source / f"dir_{i % 2}" / f"file_{i}.txt"
+        f.parent.mkdir(parents=True, exist_ok=True)
+        f.write_text(str(i) * (i + 1))
+        members.append(
+            bundle_utils.BundleMember(
+                logical_key=f"dir_{i % 2}/file_{i}.txt",
+                filepath=f,
+                size=f.stat().st_size,
+                meta={"index": i},
+            )
+        )
+
+    # Bundle
+    bundled = Path(tmpdir) / "bundled"
+    bundle_index = bundle_utils.create_bundles(members, bundled, shard_size)
+    assert len(bundle_index["shards"]) == expected_shards
+    assert bundle_index["members"]["dir_1/file_3.txt"]["meta"] == {"index": 3}
+
+    # Unbundle
+    assert bundle_utils.unbundle(bundled) == 5
+    for member in members:
+        restored = bundled / member.logical_key
+        assert restored.read_bytes() == member.filepath.read_bytes()
+
+    # Shards are removed once unbundled
+    assert not (bundled / bundle_utils.BUNDLE_DIR).exists()
+
+
+def test_unbundle_without_bundles(tmpdir):
+    assert bundle_utils.unbundle(Path(tmpdir)) == 0
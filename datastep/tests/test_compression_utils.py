@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from pathlib import Path
+
+import pytest
+
+from datastep import compression_utils
+
+###############################################################################
+
+pytest.importorskip("zstandard")
+
+###############################################################################
+
+
+@pytest.mark.parametrize("n_files", [1, 4])
+def test_compression_round_trip(tmpdir, n_files):
+    # Create compressible files
+    originals = []
+    for i in range(n_files):
+        f = Path(tmpdir) / "source" / f"file_{i}.csv"
+        f.parent.mkdir(parents=True, exist_ok=True)
+        f.write_text("a,b,c\n" + f"{i},{i},{i}\n" * 1000)
+        originals.append(f)
+
+    # Compress
+    targets = [Path(tmpdir) / "compressed" / f.name for f in originals]
+    compression_utils.compress_files(list(zip(originals, targets)), n_workers=2)
+    for original, target in zip(originals, targets):
+        assert target.stat().st_size < original.stat().st_size
+
+    # Decompress in place
+    compression_utils.decompress_files(targets, n_workers=2)
+    for original, target in zip(originals, targets):
+        assert target.read_bytes() == original.read_bytes()
@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import hashlib
 from pathlib import Path
 
 import pandas as pd
@@ -118,12 +119,16 @@ def test_resolve_directory(data_dir, f):
 def test_rel2abs2rel(manifest, filepath_columns, relative_dir):
     # Run rel2abs
     df_abs = file_utils.manifest_filepaths_rel2abs(
-        manifest, filepath_columns, relative_dir,
+        manifest,
+        filepath_columns,
+        relative_dir,
     )
 
     # Run abs2rel
     df_rel = file_utils.manifest_filepaths_abs2rel(
-        df_abs, filepath_columns, relative_dir,
+        df_abs,
+        filepath_columns,
+        relative_dir,
     )
 
     # Check that the paths in each filepath column are equal to the original manifest
@@ -181,22 +186,30 @@ def test_rel2abs2rel(manifest, filepath_columns, relative_dir):
 def test_2Xrel2abs2rel(manifest, filepath_columns, relative_dir):
     # Run rel2abs
     df_abs = file_utils.manifest_filepaths_rel2abs(
-        manifest, filepath_columns, relative_dir,
+        manifest,
+        filepath_columns,
+        relative_dir,
     )
 
     # Run rel2abs round two
     df_abs_2 = file_utils.manifest_filepaths_rel2abs(
-        df_abs, filepath_columns, relative_dir,
+        df_abs,
+        filepath_columns,
+        relative_dir,
     )
 
     # Run abs2rel
     df_rel = file_utils.manifest_filepaths_abs2rel(
-        df_abs_2, filepath_columns, relative_dir,
+        df_abs_2,
+        filepath_columns,
+        relative_dir,
     )
 
     # Run abs2rel round two
     df_rel_2 = file_utils.manifest_filepaths_abs2rel(
-        df_rel, filepath_columns, relative_dir,
+        df_rel,
+        filepath_columns,
+        relative_dir,
     )
 
     # Check that the paths in each filepath column are equal to the original manifest
@@ -207,3 +220,109 @@ def test_2Xrel2abs2rel(manifest, filepath_columns, relative_dir):
 def test_sanitize_name():
     output_str = file_utils._sanitize_name("my dir")
     assert output_str == "my_dir"
+
+
+@pytest.mark.parametrize(
+    "background, n_workers", [(False, None), (False, 4), (True, None), (True, 4)]
+)
+def test_clean(tmpdir, background, n_workers):
+    # Create a small tree
+    dirpath = Path(tmpdir) / "staging"
+    for i in range(3):
+        (dirpath / f"sub_{i}").mkdir(parents=True)
+        (dirpath / f"sub_{i}" / "file.txt").touch()
+        (dirpath / f"file_{i}.txt").touch()
+
+    # Run
+    thread = file_utils._clean(dirpath, background=background, n_workers=n_workers)
+
+    # The directory is immediately empty and usable
+    assert dirpath.is_dir()
+    assert len(list(dirpath.iterdir())) == 0
+
+    # Tombstones are removed once the background thread finishes
+    if background:
+        thread.join()
+    assert list(Path(tmpdir).iterdir()) == [dirpath]
+
+
+def test_clean_background_tombstone_collisions(tmpdir, monkeypatch):
+    dirpath = Path(tmpdir) / "staging"
+    dirpath.mkdir()
+
+    # Left behind by interrupted cleans, one is still claimed by an earlier clean
+    claimed = Path(tmpdir) / ".staging.tombstone-claimed"
+    failing = Path(tmpdir) / ".staging.tombstone-failing"
+    leftover = Path(tmpdir) / ".staging.tombstone-leftover"
+    for tombstone in [claimed, failing, leftover]:
+        (tombstone / "sub").mkdir(parents=True)
+    monkeypatch.setattr(file_utils, "_claimed_tombstones", {str(claimed)})
+
+    # Another process removes one of the tombstones first
+    remove_tree = file_utils._remove_tree
+
+    def colliding_remove_tree(tombstone, n_workers=None):
+        if tombstone == failing:
+            raise FileNotFoundError(tombstone)
+
+        remove_tree(tombstone, n_workers)
+
+    monkeypatch.setattr(file_utils, "_remove_tree", colliding_remove_tree)
+
+    # Run
+    file_utils._clean(dirpath, background=True).join()
+
+    # The claimed tombstone is untouched, the rest are removed despite the failure
+    assert sorted(Path(tmpdir).iterdir()) == sorted([dirpath, claimed, failing])
+    assert file_utils._claimed_tombstones == {str(claimed)}
+
+
+@pytest.mark.parametrize("dry_run", [True, False])
+def test_remove_unreferenced(tmpdir, dry_run):
+    # Create a tree with referenced, protected, and unreferenced files
+    dirpath = Path(tmpdir) / "staging"
+    (dirpath / "kept").mkdir(parents=True)
+    (dirpath / "stale").mkdir(parents=True)
+    (dirpath / "protected").mkdir(parents=True)
+    (dirpath / "kept" / "a.txt").write_text("a")
+    (dirpath / "kept" / "b.txt").write_text("bb")
+    (dirpath / "stale" / "c.txt").write_text("ccc")
+    (dirpath / "protected" / "d.txt").write_text("dddd")
+    (dirpath / "manifest.parquet").write_text("e")
+
+    # Run
+    files_removed, bytes_reclaimed = file_utils._remove_unreferenced(
+        dirpath,
+        referenced=[dirpath / "kept" / "a.txt"],
+        protected=["protected", "manifest.parquet"],
+        dry_run=dry_run,
+    )
+
+    # Check
+    assert files_removed == 2
+    assert bytes_reclaimed == 5
+    assert (dirpath / "kept" / "a.txt").is_file()
+    assert (dirpath / "protected" / "d.txt").is_file()
+    assert (dirpath / "manifest.parquet").is_file()
+    assert (dirpath / "kept" / "b.txt").exists() == dry_run
+    assert (dirpath / "stale").exists() == dry_run
+
+
+@pytest.mark.parametrize("n_workers", [None, 1, 4])
+@pytest.mark.parametrize("size", [0, 10, 2 ** 20 + 7])
+def test_hash_files(tmpdir, n_workers, size):
+    # Create a few files, one referenced twice
+    files = []
+    for i in range(3):
+        f = Path(tmpdir) / f"file_{i}.bin"
+        f.write_bytes(bytes([i]) * size)
+        files.append(f)
+    files.append(files[0])
+
+    # Run with a small chunk size so large files are read in many chunks
+    hashes = file_utils.hash_files(files, n_workers=n_workers, chunk_size=2 ** 16)
+
+    # Check
+    assert len(hashes) == 3
+    for f in files:
+        assert hashes[str(f)] == hashlib.sha256(f.read_bytes()).hexdigest()
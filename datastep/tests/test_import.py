@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import subprocess
+import sys
+
+import pytest
+
+###############################################################################
+
+HEAVY_MODULES = [
+    "botocore",
+    "git",
+    "jinja2",
+    "pandas",
+    "prefect",
+    "quilt3",
+    "tqdm",
+]
+
+###############################################################################
+
+
+@pytest.mark.skipif(
+    sys.version_info < (3, 7), reason="Lazy package attributes require Python 3.7+"
+)
+@pytest.mark.parametrize(
+    "statement",
+    [
+        "import datastep",
+        "from datastep import constants, exceptions, file_utils, metrics, progress",
+        "from datastep import manifest_writer, quilt_utils, run_utils",
+        "from datastep import bundle_utils, compression_utils, transfer",
+    ],
+)
+def test_import_is_lazy(statement):
+    # Run in a fresh interpreter so nothing was previously imported
+    # -X importtime reports every module imported and how long each took
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+
+    # Each report line is: "import time: self [us] | cumulative | module"
+    imported = set()
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            module = line.rsplit("|", 1)[1].strip()
+            imported.add(module.split(".")[0])
+
+    assert "datastep" in imported
+    assert imported.isdisjoint(HEAVY_MODULES)
+
+
+def test_readme_template_is_compiled_on_access():
+    from jinja2 import Template
+
+    from datastep import constants
+
+    assert isinstance(constants.README_TEMPLATE, Template)
+    assert constants.README_TEMPLATE is constants.README_TEMPLATE
+    rendered = constants.README_TEMPLATE.render(quilt_package_name="aics/project")
+    assert rendered.startswith("# aics/project")
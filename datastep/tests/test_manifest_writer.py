@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from datastep.manifest_writer import ManifestWriter
+
+###############################################################################
+
+
+@pytest.mark.parametrize(
+    "n_rows, buffer_size, expected_n_parts",
+    [(0, 2, 0), (1, 2, 1), (4, 2, 2), (5, 2, 3)],
+)
+def test_manifest_writer_append(tmpdir, n_rows, buffer_size, expected_n_parts):
+    writer = ManifestWriter(Path(tmpdir) / "parts", buffer_size=buffer_size)
+    for i in range(n_rows):
+        writer.append({"filepath": Path(f"file{i}.txt"), "index": i})
+
+    # Read forces a flush of any remaining buffered rows
+    manifest = writer.read()
+    assert len(writer.parts) == expected_n_parts
+
+    if n_rows == 0:
+        assert manifest is None
+    else:
+        assert list(manifest["index"]) == list(range(n_rows))
+        assert manifest["filepath"].iloc[0] == "file0.txt"
+
+
+def test_manifest_writer_survives_restart(tmpdir):
+    writer = ManifestWriter(Path(tmpdir) / "parts", buffer_size=2)
+    writer.extend(pd.DataFrame([{"filepath": f"file{i}.txt"} for i in range(2)]))
+    writer.append({"filepath": "file2.txt"})
+
+    # Rows that were not flushed are lost with the writer, flushed rows are not
+    restarted = ManifestWriter(Path(tmpdir) / "parts", buffer_size=2)
+    restarted.append({"filepath": "file3.txt"})
+    assert list(restarted.read()["filepath"]) == [
+        "file0.txt",
+        "file1.txt",
+        "file3.txt",
+    ]
+
+    # Reset removes everything
+    restarted.reset()
+    assert restarted.read() is None
+
+
+def test_manifest_writer_completed_units(tmpdir):
+    writer = ManifestWriter(Path(tmpdir) / "parts", buffer_size=2)
+    writer.extend([{"filepath": "a0.txt"}, {"filepath": "a1.txt"}], unit="a")
+    writer.complete("b")
+    writer.append({"filepath": "c0.txt"}, unit="c")
+
+    # Unit "a" was flushed with its rows, "b" and "c" are still buffered
+    assert writer.is_complete("a")
+    assert not writer.is_complete("c")
+
+    # A restarted writer only sees the units that were stored
+    restarted = ManifestWriter(Path(tmpdir) / "parts", buffer_size=2)
+    assert restarted.completed_units == {"a"}
+
+    # Units without rows are still stored
+    restarted.complete("b")
+    restarted.flush()
+    assert ManifestWriter(Path(tmpdir) / "parts").completed_units == {"a", "b"}
+
+    # Units whose part never made it to disk are ignored
+    (Path(tmpdir) / "parts" / "part-000000.parquet").unlink()
+    assert ManifestWriter(Path(tmpdir) / "parts").completed_units == {"b"}
+
+
+def test_manifest_writer_process_units_skips_completed(tmpdir):
+    processed = []
+    preempted = {2}
+
+    def process(unit):
+        # Simulate the node being preempted part way through the first run
+        if unit in preempted:
+            preempted.remove(unit)
+            raise RuntimeError("Preempted")
+
+        processed.append(unit)
+        if unit == 1:
+            return None
+
+        return [{"filepath": f"file{unit}.txt"}]
+
+    writer = ManifestWriter(Path(tmpdir) / "parts", buffer_size=1)
+    with pytest.raises(RuntimeError):
+        writer.process_units(process, range(4))
+    assert processed == [0, 1]
+
+    # The resumed run only processes the units that weren't completed
+    restarted = ManifestWriter(Path(tmpdir) / "parts", buffer_size=1)
+    restarted.process_units(process, range(4))
+    assert processed == [0, 1, 2, 3]
+    assert list(restarted.read()["filepath"]) == [
+        "file0.txt",
+        "file2.txt",
+        "file3.txt",
+    ]
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+from pathlib import Path
+
+import pytest
+
+from datastep import metrics
+
+###############################################################################
+
+
+def test_operation_records(tmpdir):
+    received = []
+    metrics.register_hook(received.append)
+
+    try:
+        with metrics.operation("push", record_dir=Path(tmpdir)) as record:
+            with metrics.phase("git_checks"):
+                pass
+            with metrics.phase("upload", files=2) as upload:
+                upload["bytes"] = 1024
+            record["files"] = 2
+    finally:
+        metrics.remove_hook(received.append)
+
+    # Hooks receive every phase then the operation
+    assert [r["name"] for r in received] == ["git_checks", "upload", "push"]
+
+    # Phases are nested in the stored operation record
+    with open(Path(tmpdir) / "timings.json", "r") as read_in:
+        stored = json.load(read_in)
+    assert stored["push"]["files"] == 2
+    assert [p["name"] for p in stored["push"]["phases"]] == ["git_checks", "upload"]
+    assert stored["push"]["phases"][1]["bytes"] == 1024
+    assert stored["push"]["wall_time"] >= 0
+
+
+def test_operation_records_failure(tmpdir):
+    with pytest.raises(ValueError):
+        with metrics.operation("run", record_dir=Path(tmpdir)):
+            with metrics.phase("run"):
+                raise ValueError("failed")
+
+    # The failed operation is still stored and other operations are kept
+    with metrics.operation("push", record_dir=Path(tmpdir)):
+        pass
+
+    with open(Path(tmpdir) / "timings.json", "r") as read_in:
+        stored = json.load(read_in)
+    assert set(stored.keys()) == {"run", "push"}
+    assert "ValueError" in stored["run"]["phases"][0]["error"]
+
+
+def test_get_resource_usage(tmpdir):
+    start = metrics.sample_resources()
+    with open(Path(tmpdir) / "out.bin", "wb") as write_out:
+        write_out.write(b"0" * 1024)
+    usage = metrics.get_resource_usage(start)
+
+    assert usage["wall_time"] >= 0
+    assert usage["cpu_time"] >= 0
+    for counter in ["bytes_read", "bytes_written", "peak_rss"]:
+        assert usage[counter] is None or usage[counter] >= 0
+
+
+def test_get_io_counters_unavailable(monkeypatch):
+    psutil = pytest.importorskip("psutil")
+
+    # Like on macOS, where the process has no io_counters
+    monkeypatch.delattr(psutil.Process, "io_counters", raising=False)
+
+    assert metrics.get_io_counters() is None
+    usage = metrics.get_resource_usage(metrics.sample_resources())
+    assert usage["bytes_read"] is None
+    assert usage["bytes_written"] is None
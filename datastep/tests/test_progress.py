@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from datastep import metrics, progress
+from datastep.progress import ProgressReporter
+
+###############################################################################
+
+
+def test_progress_reporter_batches_updates():
+    received = []
+    metrics.register_hook(received.append)
+
+    try:
+        # A long interval means nothing is reported until close
+        with ProgressReporter(
+            total=10000, desc="Testing", mode="metrics", min_interval=3600
+        ) as progress:
+            with ThreadPoolExecutor() as exe:
+                list(exe.map(lambda i: progress.update(), range(10000)))
+
+            assert len(received) == 0
+    finally:
+        metrics.remove_hook(received.append)
+
+    assert progress.n == 10000
+    assert received == [
+        {"type": "progress", "name": "Testing", "n": 10000, "total": 10000}
+    ]
+
+
+@pytest.mark.parametrize("mode", ["log", "off"])
+def test_progress_reporter_modes(mode):
+    with ProgressReporter(total=3, desc="Testing", mode=mode, min_interval=0) as p:
+        for i in range(3):
+            p.update()
+
+    assert p.n == 3
+
+
+def test_progress_env_mode_validated(monkeypatch, caplog):
+    monkeypatch.setenv(progress.PROGRESS_ENV_VAR_NAME, "bogus")
+    assert progress._get_env_mode() == "tqdm"
+    assert "Unknown DATASTEP_PROGRESS value" in caplog.text
+
+    monkeypatch.setenv(progress.PROGRESS_ENV_VAR_NAME, "log")
+    assert progress._get_env_mode() == "log"
+
+
+def test_progress_reporter_unknown_mode():
+    with pytest.raises(ValueError):
+        ProgressReporter(total=3, desc="Testing", mode="bogus")
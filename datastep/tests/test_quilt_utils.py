@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from pathlib import Path
+
+import pytest
+
+from datastep import quilt_utils
+
+###############################################################################
+
+
+def test_create_manifest_index():
+    import pandas as pd
+
+    manifest = pd.DataFrame(
+        {
+            "filepath": ["images/a.tiff", "images/a.tiff", None],
+            "thumbnail": ["thumbs/a.png", float("nan"), "images/a.tiff"],
+        }
+    )
+
+    index = quilt_utils.create_manifest_index(manifest, ["filepath", "thumbnail"])
+
+    # Null cells are not indexed
+    assert set(index["logical_keys"]) == {"images/a.tiff", "thumbs/a.png"}
+    assert index["logical_keys"]["images/a.tiff"] == {
+        "rows": [0, 1, 2],
+        "columns": ["filepath", "filepath", "thumbnail"],
+    }
+    assert index["associates"] == [
+        {"filepath": "images/a.tiff", "thumbnail": "thumbs/a.png"},
+        {"filepath": "images/a.tiff"},
+        {"thumbnail": "images/a.tiff"},
+    ]
+
+
+@pytest.mark.parametrize(
+    "values, dtype, expected",
+    [
+        ([1, 2], "int64", [1, 2]),
+        ([1.5, 2.5], "float64", [1.5, 2.5]),
+        ([1, None], "Int64", [1, None]),
+        ([True, None], "boolean", [True, None]),
+        ([1.5, None], "Float64", [1.5, None]),
+        (
+            ["2020-01-01", None],
+            "datetime64[ns]",
+            ["2020-01-01 00:00:00", None],
+        ),
+        ([Path("a/b.txt"), None], "object", ["a/b.txt", None]),
+        ([(1, 2), ["c", "d"]], "object", [(1, 2), ["c", "d"]]),
+    ],
+)
+def test_coerce_metadata_column(values, dtype, expected):
+    import json
+
+    import pandas as pd
+
+    coerced = quilt_utils._coerce_metadata_column(pd.Series(values, dtype=dtype))
+    assert coerced == expected
+
+    # Everything must be storable as package metadata
+    json.dumps(coerced)
+
+
+@pytest.mark.parametrize(
+    "version_id, hash_type, expected_files",
+    [
+        # Versioned remote copies are reused
+        ("v1", "SHA256", 1),
+        # Unversioned remote copies may be overwritten, upload again
+        (None, "SHA256", 0),
+        # Hashes of another type can't be compared, upload again
+        ("v1", "sha2-256-chunked", 0),
+    ],
+)
+def test_dedupe_package(tmpdir, version_id, hash_type, expected_files):
+    from quilt3.packages import Package, PackageEntry
+    from quilt3.util import PhysicalKey
+
+    # Create a local package with one changed and one unchanged file
+    unchanged = Path(tmpdir) / "unchanged.txt"
+    unchanged.write_text("unchanged")
+    changed = Path(tmpdir) / "changed.txt"
+    changed.write_text("changed")
+    pkg = Package()
+    pkg.set("step/unchanged.txt", str(unchanged))
+    pkg.set("step/changed.txt", str(changed))
+    quilt_utils.set_package_hashes(pkg)
+
+    # The prior version of the package stored the unchanged file remotely
+    prior = Package()
+    prior.set(
+        "other_step/unchanged.txt",
+        PackageEntry(
+            PhysicalKey("bucket", "pkg/other_step/unchanged.txt", version_id),
+            pkg["step/unchanged.txt"].size,
+            {"type": hash_type, "value": pkg["step/unchanged.txt"].hash["value"]},
+            {},
+        ),
+    )
+
+    # Dedupe
+    stats = quilt_utils.dedupe_package(pkg, quilt_utils.get_remote_keys(prior))
+
+    # Only the unchanged file points at the remote copy
+    assert stats["files"] == expected_files
+    assert pkg["step/changed.txt"].physical_key.is_local()
+    assert pkg["step/unchanged.txt"].physical_key.is_local() == (expected_files == 0)
+    if expected_files == 1:
+        assert stats["bytes"] == unchanged.stat().st_size
+        assert (
+            pkg["step/unchanged.txt"].physical_key
+            == prior["other_step/unchanged.txt"].physical_key
+        )
+
+
+def test_upload_and_fetch_package_in_chunks(tmpdir):
+    from quilt3 import Package
+
+    from datastep import transfer
+
+    # More files than fit in a single chunk
+    src = Path(tmpdir) / "src"
+    src.mkdir()
+    pkg = Package()
+    for i in range(3 * transfer.FILES_PER_REQUEST_SLOT):
+        (src / f"{i}.txt").write_text(str(i))
+        pkg.set(f"files/{i}.txt", str(src / f"{i}.txt"))
+
+    # Upload then fetch with a controller that only allows one request at a time
+    controller = transfer.AdaptiveConcurrency(initial=1, maximum=1)
+    uploaded = quilt_utils.upload_package(
+        pkg, str(Path(tmpdir) / "registry"), controller=controller
+    )
+    fetched = quilt_utils.fetch_package(
+        uploaded, Path(tmpdir) / "dest", controller=controller
+    )
+
+    # Every file made the round trip
+    for logical_key, entry in pkg.walk():
+        uploaded_path = Path(uploaded[logical_key].physical_key.path)
+        assert uploaded_path.parent == Path(tmpdir) / "registry" / "files"
+        fetched_path = Path(tmpdir) / "dest" / logical_key
+        assert fetched[logical_key].physical_key.path == str(fetched_path)
+        assert fetched_path.read_text() == Path(entry.physical_key.path).read_text()
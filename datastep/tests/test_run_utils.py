@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import importlib
+from pathlib import Path
+
+import pytest
+
+from datastep import run_utils
+
+###############################################################################
+
+
+def test_get_source_hash_includes_imported_modules(tmpdir, monkeypatch):
+    # A step module importing a helper module of the same project
+    project = Path(tmpdir) / "memo_project"
+    project.mkdir()
+    (project / "__init__.py").write_text("")
+    (project / "helpers.py").write_text("def scale(x):\n    return x * 2\n")
+    (project / "steps.py").write_text(
+        "from .helpers import scale\n\n\nclass Scale:\n    pass\n"
+    )
+    monkeypatch.syspath_prepend(str(tmpdir))
+    steps = importlib.import_module("memo_project.steps")
+
+    original = run_utils.get_source_hash(steps.Scale)
+    assert original == run_utils.get_source_hash(steps.Scale)
+
+    # Changing the helper changes the hash
+    (project / "helpers.py").write_text("def scale(x):\n    return x * 3\n")
+    assert run_utils.get_source_hash(steps.Scale) != original
+
+
+def test_profile_cprofile(tmpdir):
+    dirpath = Path(tmpdir)
+    (dirpath / "run_profile.html").write_text("stale")
+
+    with run_utils.profile(dirpath, "cprofile") as profiler:
+        sum(range(1000))
+
+    assert profiler == "cprofile"
+    assert (dirpath / "run_profile.prof").is_file()
+    assert "cumulative" in (dirpath / "run_profile.txt").read_text()
+
+    # Artifacts of a prior profile are removed
+    assert not (dirpath / "run_profile.html").exists()
+
+
+def test_profile_unknown_profiler(tmpdir):
+    with pytest.raises(ValueError):
+        with run_utils.profile(Path(tmpdir), "yappi"):
+            pass
@@ -5,15 +5,81 @@ import os
 import shutil
 from pathlib import Path
 
+import pandas as pd
 import pytest
 
-from datastep import constants, file_utils
+from datastep import constants, exceptions, file_utils, log_run_params
 
 from .example_step import ExampleStep
 
 ###############################################################################
 
 
+def _create_local_registry_step(tmpdir) -> ExampleStep:
+    # A step that pushes to and checks out from a registry on the local filesystem
+    return ExampleStep(
+        config={
+            "quilt_storage_bucket": str(Path(tmpdir) / "registry"),
+            "quilt_package_owner": "aics",
+            "quilt_package_name": "project",
+            "project_local_staging_dir": str(Path(tmpdir) / "local_staging"),
+            "examplestep": {
+                "step_local_staging_dir": str(Path(tmpdir) / "local_staging" / "step")
+            },
+        }
+    )
+
+
+def _publish_local_step_data(tmpdir, branch: str = "master") -> Path:
+    # Publish a single file and its manifest as this branch's examplestep data
+    import pandas as pd
+    import quilt3
+
+    data_dir = Path(tmpdir) / "published"
+    data_dir.mkdir(exist_ok=True)
+    (data_dir / "data.txt").write_text("data")
+    pd.DataFrame({"filepath": ["data.txt"]}).to_parquet(data_dir / "manifest.parquet")
+
+    pkg = quilt3.Package()
+    for name in ["data.txt", "manifest.parquet"]:
+        pkg.set(f"{branch}/examplestep/{name}", str(data_dir / name))
+    pkg.build("aics/project", registry=str(Path(tmpdir) / "registry"))
+
+    return data_dir
+
+
+def _patch_git(monkeypatch):
+    # Pushing requires a clean, pushed git repo with an origin, pretend to have one
+    git_values = {
+        "_get_current_git_branch": "master",
+        "_get_current_git_commit_hash": "abc123",
+        "_get_git_origin_url": "https://github.com/aics/project",
+        "_create_data_commit_message": "data created from test",
+        "_check_git_status_is_clean": None,
+    }
+    for name, value in git_values.items():
+        monkeypatch.setattr(
+            ExampleStep, name, staticmethod(lambda *args, value=value: value)
+        )
+
+
+def _write_partition(partition, partition_dir, fail_rows=[]):
+    # Write a file per row of the partition, failing on the requested rows
+    rows = []
+    for i in partition.index:
+        if i in fail_rows:
+            raise RuntimeError("Preempted")
+
+        path = partition_dir / f"{i}.txt"
+        path.write_text(str(i))
+        rows.append({"filepath": path, "row": i})
+
+    return pd.DataFrame(rows)
+
+
+###############################################################################
+
+
 @pytest.mark.parametrize(
     "config_var, "
     "set_env, "
@@ -295,3 +361,408 @@ def test_clean():
     t.run()
     t.clean()
     assert len([file for file in t.step_local_staging_dir.iterdir()]) == 0
+
+
+def test_rebase_onto_latest_keeps_other_steps(tmpdir, monkeypatch):
+    import quilt3
+
+    from datastep import Step, quilt_utils, transfer
+    from datastep.step import _publish_step_subtrees
+
+    registry = str(Path(tmpdir) / "registry")
+    data = Path(tmpdir) / "data"
+    data.mkdir()
+    (data / "a.txt").write_text("a")
+    (data / "b.txt").write_text("b")
+    step_a = quilt3.Package().set("a.txt", str(data / "a.txt"))
+    step_b = quilt3.Package().set("b.txt", str(data / "b.txt"))
+    quilt_utils.set_package_hashes(step_a)
+    quilt_utils.set_package_hashes(step_b)
+
+    # Step A checked the still empty project package before step B built, so it
+    # publishes right after step B's build without step B's data
+    get_latest_top_hash = quilt_utils.get_latest_top_hash
+    calls = []
+
+    def racing_get_latest_top_hash(quilt_loc, registry):
+        calls.append(quilt_loc)
+        if len(calls) == 3:
+            published = Step._merge_step_package(
+                quilt3.Package(), "master/step_a", step_a
+            )
+            published.build(quilt_loc, registry=registry)
+
+        return get_latest_top_hash(quilt_loc, registry)
+
+    monkeypatch.setattr(quilt_utils, "get_latest_top_hash", racing_get_latest_top_hash)
+    monkeypatch.setattr(transfer, "get_backoff_delay", lambda attempt: 0)
+
+    # Publish step B
+    _publish_step_subtrees(
+        {"master/step_b": step_b},
+        quilt_loc="aics/project",
+        registry=registry,
+        message="step b",
+    )
+
+    # Step B found its data missing from the latest revision and rebased onto it
+    assert len(calls) > 3
+    latest = quilt3.Package.browse("aics/project", registry)
+    for step_prefix, step_pkg in [("master/step_a", step_a), ("master/step_b", step_b)]:
+        step_hashes = quilt_utils.get_entry_hashes(step_pkg)
+        assert Step._has_step_package(latest, step_prefix, step_hashes)
+    assert not Step._has_step_package(latest, "master/step_c", step_hashes)
+
+
+def test_publish_step_packages_browses_once(tmpdir, monkeypatch):
+    import quilt3
+
+    from datastep import quilt_utils
+    from datastep.step import _publish_step_packages
+
+    registry = str(Path(tmpdir) / "registry")
+    data = Path(tmpdir) / "data"
+    data.mkdir()
+    (data / "a.txt").write_text("a")
+    (data / "b.txt").write_text("b")
+
+    # Another step already published
+    other = quilt3.Package().set("master/step_a/a.txt", str(data / "a.txt"))
+    other.build("aics/project", registry=registry)
+
+    # Count browses of the project package
+    browse = quilt3.Package.browse
+    browsed = []
+
+    def counting_browse(*args, **kwargs):
+        browsed.append(args)
+        return browse(*args, **kwargs)
+
+    monkeypatch.setattr(quilt3.Package, "browse", counting_browse)
+
+    # Publish
+    _publish_step_packages(
+        {"master/step_b": quilt3.Package().set("b.txt", str(data / "b.txt"))},
+        quilt_loc="aics/project",
+        registry=registry,
+        message="step b",
+    )
+
+    # Dedupe and publish shared a single browse
+    assert len(browsed) == 1
+    latest = browse("aics/project", registry)
+    assert "a.txt" in latest["master/step_a"]
+    assert "b.txt" in latest["master/step_b"]
+    assert quilt_utils.get_latest_top_hash("aics/project", registry) == latest.top_hash
+
+
+@pytest.mark.parametrize(
+    "n_steps, exception",
+    [
+        (0, ValueError),
+        (2, exceptions.PackagingError),
+    ],
+)
+def test_push_all_rejects_invalid_steps(n_steps, exception):
+    from datastep import push_all
+
+    # Steps with the same name would overwrite each other
+    steps = [ExampleStep() for i in range(n_steps)]
+    with pytest.raises(exception):
+        push_all(steps)
+
+
+def test_promote(tmpdir):
+    import quilt3
+    from quilt3.util import PhysicalKey
+
+    from datastep import quilt_utils
+
+    registry = str(Path(tmpdir) / "registry")
+    step = ExampleStep(
+        config={
+            "quilt_storage_bucket": registry,
+            "quilt_package_owner": "aics",
+            "quilt_package_name": "project",
+            "project_local_staging_dir": str(Path(tmpdir) / "local_staging"),
+            "examplestep": {
+                "step_local_staging_dir": str(Path(tmpdir) / "local_staging" / "step")
+            },
+        }
+    )
+
+    # Nothing to promote yet
+    with pytest.raises(exceptions.PackagingError):
+        step.promote("feature/branch")
+
+    # Publish data for the step on a feature branch
+    # One file stored in a versioned bucket, one stored without a version
+    data = Path(tmpdir) / "data.txt"
+    data.write_text("data")
+    pkg = quilt3.Package().set("feature.branch/examplestep/data.txt", str(data))
+    quilt_utils.set_package_hashes(pkg)
+    versioned = pkg["feature.branch/examplestep/data.txt"].with_physical_key(
+        PhysicalKey("bucket", "aics/project/data.txt", "v1")
+    )
+    pkg.set("feature.branch/examplestep/versioned.txt", versioned)
+    pkg.build("aics/project", registry=registry)
+
+    # Promote
+    step.promote("feature/branch")
+
+    # The versioned entry reuses the physical key and hash of the source entry
+    latest = quilt3.Package.browse("aics/project", registry)
+    source = latest["feature.branch/examplestep/versioned.txt"]
+    promoted = latest["master/examplestep/versioned.txt"]
+    assert promoted.physical_key == source.physical_key
+    assert promoted.hash == source.hash
+
+    # The unversioned entry was copied to the target branch directory
+    source = latest["feature.branch/examplestep/data.txt"]
+    promoted = latest["master/examplestep/data.txt"]
+    assert promoted.physical_key != source.physical_key
+    assert promoted.hash == source.hash
+    assert Path(promoted.physical_key.path) == (
+        Path(registry) / "aics/project/master/examplestep/data.txt"
+    )
+    assert Path(promoted.physical_key.path).read_text() == "data"
+
+    # Promoting to the same branch isn't allowed
+    with pytest.raises(ValueError):
+        step.promote("master", "master")
+
+
+def test_manifest_index_lookups(tmpdir):
+    import json
+
+    import pandas as pd
+
+    from datastep import quilt_utils
+
+    step = ExampleStep(
+        filepath_columns=["filepath", "thumbnail"],
+        metadata_columns=["fov"],
+        config={
+            "project_local_staging_dir": str(Path(tmpdir) / "local_staging"),
+            "examplestep": {
+                "step_local_staging_dir": str(Path(tmpdir) / "local_staging" / "step")
+            },
+        },
+    )
+
+    # Row 0 references the same file from both filepath columns
+    step.manifest = pd.DataFrame(
+        {
+            "filepath": ["a.tiff", "a.tiff", "b.tiff"],
+            "thumbnail": ["a.tiff", "a.png", None],
+            "fov": [1, 2, 3],
+        }
+    )
+    with open(step.step_local_staging_dir / "manifest_index.json", "w") as write_out:
+        json.dump(
+            quilt_utils.create_manifest_index(step.manifest, step.filepath_columns),
+            write_out,
+        )
+
+    # Every reference is found
+    assert step.get_manifest_rows("a.tiff") == [
+        (0, "filepath"),
+        (1, "filepath"),
+        (0, "thumbnail"),
+    ]
+
+    # Each row is only returned once
+    assert step.get_associates("a.tiff") == [
+        {"filepath": "a.tiff", "thumbnail": "a.tiff"},
+        {"filepath": "a.tiff", "thumbnail": "a.png"},
+    ]
+    assert step.get_metadata("a.tiff")["fov"] == [1, 2]
+    assert step.get_associates("b.tiff") == [{"filepath": "b.tiff"}]
+
+    with pytest.raises(KeyError):
+        step.get_manifest_rows("missing.tiff")
+
+
+def test_checkout_replaces_local_manifest_parts(tmpdir, monkeypatch):
+    _patch_git(monkeypatch)
+    _publish_local_step_data(tmpdir)
+    step = _create_local_registry_step(tmpdir)
+
+    # Rows left over from a prior local run
+    step.manifest_writer.append({"filepath": "stale.txt"})
+    step.manifest_writer.flush()
+
+    # Checkout
+    step.checkout()
+
+    # The checked out manifest is used rather than the leftover rows
+    assert step.manifest_writer.parts == []
+    assert list(step.manifest["filepath"]) == [
+        str((step.step_local_staging_dir / "data.txt").resolve())
+    ]
+    restarted = _create_local_registry_step(tmpdir)
+    assert list(restarted.manifest["filepath"]) == ["data.txt"]
+
+
+def test_push_sidecar_metadata_checkout(tmpdir, monkeypatch):
+    _patch_git(monkeypatch)
+    step = _create_local_registry_step(tmpdir)
+    step.metadata_columns = ["cell"]
+    (step.step_local_staging_dir / "run_parameters.json").write_text("{}")
+    for name in ["a.txt", "b.txt"]:
+        (step.step_local_staging_dir / name).write_text(name)
+
+    # Two rows reference the same file
+    filepaths = [step.step_local_staging_dir / n for n in ["a.txt", "a.txt", "b.txt"]]
+    step.manifest = pd.DataFrame({"filepath": filepaths, "cell": [1, 2, 3]})
+    step.push(sidecar_metadata=True)
+
+    # Checkout into a fresh step local staging dir with no prior manifest
+    shutil.rmtree(step.step_local_staging_dir)
+    restored = _create_local_registry_step(tmpdir)
+    restored.metadata_columns = ["cell"]
+    assert restored.manifest is None
+    restored.checkout()
+
+    assert list(restored.manifest["filepath"]) == [
+        str((restored.step_local_staging_dir / name).resolve())
+        for name in ["a.txt", "a.txt", "b.txt"]
+    ]
+    assert restored.get_metadata("a.txt") == {
+        "cell": [1, 2],
+        "associates": [{"filepath": "a.txt"}, {"filepath": "a.txt"}],
+    }
+    assert restored.get_metadata("b.txt") == {
+        "cell": [3],
+        "associates": [{"filepath": "b.txt"}],
+    }
+
+
+def test_clean_unreferenced_relative_staging_dir(tmpdir, monkeypatch):
+    # Manifest paths relative to the working directory, like the default config
+    monkeypatch.chdir(tmpdir)
+    step = ExampleStep(
+        config={
+            "project_local_staging_dir": "local_staging",
+            "examplestep": {"step_local_staging_dir": "local_staging/examplestep"},
+        }
+    )
+    staging = Path("local_staging/examplestep")
+    (staging / "keep.txt").write_text("keep")
+    (staging / "stale.txt").write_text("stale")
+    step.manifest = pd.DataFrame({"filepath": [str(staging / "keep.txt")]})
+
+    # Clean
+    removed = step.clean_unreferenced()
+
+    # Only the unreferenced file is removed
+    assert removed == {"files": 1, "bytes": 5}
+    assert (staging / "keep.txt").is_file()
+    assert not (staging / "stale.txt").exists()
+
+
+@pytest.mark.parametrize("compress_columns", [["missing"], ["cell"]])
+def test_push_rejects_unknown_compress_columns(tmpdir, compress_columns):
+    step = _create_local_registry_step(tmpdir)
+    step.metadata_columns = ["cell"]
+    step.manifest = pd.DataFrame({"filepath": ["a.txt"], "cell": [1]})
+
+    # Rejected prior to any git checks
+    with pytest.raises(ValueError, match=compress_columns[0]):
+        step.push(compress_columns=compress_columns)
+
+
+class MemoizedStep(ExampleStep):
+    calls = 0
+
+    @log_run_params
+    def run(self, n: int = 1, memoize: bool = False, clean: bool = False, **kwargs):
+        MemoizedStep.calls += 1
+        path = self.step_local_staging_dir / "result.txt"
+        path.write_text(str(n))
+        self.manifest = pd.DataFrame({"filepath": [path]})
+        self.manifest.to_csv(self.step_local_staging_dir / "manifest.csv", index=False)
+
+        return {"n": n}
+
+
+def test_run_memoize(tmpdir, monkeypatch):
+    _patch_git(monkeypatch)
+
+    def create_step():
+        # Nothing is stored in the registry, only local memos can be restored
+        return MemoizedStep(
+            step_name="examplestep",
+            config={
+                "quilt_storage_bucket": str(Path(tmpdir) / "registry"),
+                "project_local_staging_dir": str(Path(tmpdir) / "local_staging"),
+                "examplestep": {
+                    "step_local_staging_dir": str(
+                        Path(tmpdir) / "local_staging" / "step"
+                    )
+                },
+            },
+        )
+
+    MemoizedStep.calls = 0
+    step = create_step()
+    assert step.run(n=1, memoize=True) == {"n": 1}
+    assert MemoizedStep.calls == 1
+
+    # Same parameters, restored
+    assert create_step().run(n=1, memoize=True) == {"n": 1}
+    assert MemoizedStep.calls == 1
+
+    # Different parameters, run
+    assert create_step().run(n=2, memoize=True) == {"n": 2}
+    assert MemoizedStep.calls == 2
+
+    # A clean run doesn't restore the local memo
+    assert create_step().run(n=2, memoize=True, clean=True) == {"n": 2}
+    assert MemoizedStep.calls == 3
+
+
+def test_run_memoize_detached_head(tmpdir, monkeypatch):
+    # GitPython raises TypeError for the active branch of a detached HEAD
+    def detached_branch():
+        raise TypeError("HEAD is a detached symbolic reference")
+
+    monkeypatch.setattr(
+        ExampleStep, "_get_current_git_branch", staticmethod(detached_branch)
+    )
+    MemoizedStep.calls = 0
+    step = MemoizedStep(
+        step_name="examplestep",
+        config={
+            "quilt_storage_bucket": str(Path(tmpdir) / "registry"),
+            "project_local_staging_dir": str(Path(tmpdir) / "local_staging"),
+            "examplestep": {
+                "step_local_staging_dir": str(Path(tmpdir) / "local_staging" / "step")
+            },
+        },
+    )
+
+    # No pushed run can be found, the step runs
+    assert step.run(n=1, memoize=True) == {"n": 1}
+    assert MemoizedStep.calls == 1
+
+
+def test_map_partitions_resume(tmpdir):
+    step = _create_local_registry_step(tmpdir)
+    manifest = pd.DataFrame({"value": range(6)})
+
+    # The first run is preempted while processing the last partition
+    with pytest.raises(RuntimeError):
+        step.map_partitions(_write_partition, manifest, n_partitions=3, fail_rows=[4])
+
+    # Resume on a node with a different number of CPUs
+    restarted = _create_local_registry_step(tmpdir)
+    restarted.map_partitions(_write_partition, manifest, n_partitions=2)
+    assert sorted(restarted.manifest["row"]) == list(range(6))
+
+    # A run that doesn't resume drops the partitions of the prior run
+    restarted.manifest_writer.reset()
+    restarted.map_partitions(_write_partition, manifest.iloc[:2], n_partitions=1)
+    assert sorted(restarted.manifest["row"]) == [0, 1]
+    partitions_dir = restarted.step_local_staging_dir / "partitions"
+    assert not (partitions_dir / "partition-000002").exists()
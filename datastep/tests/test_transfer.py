@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from datastep import transfer
+
+###############################################################################
+
+
+class ThrottlingError(Exception):
+    # Shaped like a botocore ClientError
+    def __init__(self, code: str, status: int):
+        super().__init__(code)
+        self.response = {
+            "Error": {"Code": code},
+            "ResponseMetadata": {"HTTPStatusCode": status},
+        }
+
+
+class ThrottlingRegistry:
+    # A stand-in registry that throttles the first few transfers
+    def __init__(self, n_throttled: int, code: str = "SlowDown", status: int = 503):
+        self.n_throttled = n_throttled
+        self.code = code
+        self.status = status
+        self.attempts = 0
+        self.limits = []
+
+    def set_limit(self, limit: int):
+        self.limits.append(limit)
+
+    def transfer(self) -> str:
+        self.attempts += 1
+        if self.attempts <= self.n_throttled:
+            raise ThrottlingError(self.code, self.status)
+
+        return "done"
+
+
+###############################################################################
+
+
+@pytest.mark.parametrize(
+    "error, expected",
+    [
+        (ThrottlingError("SlowDown", 503), True),
+        (ThrottlingError("TooManyRequestsException", 429), True),
+        (ThrottlingError("Unknown", 503), True),
+        (ThrottlingError("NoSuchKey", 404), False),
+        (ValueError("not a client error"), False),
+    ],
+)
+def test_is_throttling_error(error, expected):
+    assert transfer.is_throttling_error(error) == expected
+
+
+def test_is_throttling_error_wrapped():
+    try:
+        try:
+            raise ThrottlingError("SlowDown", 503)
+        except ThrottlingError as e:
+            raise RuntimeError("Copy failed") from e
+    except RuntimeError as e:
+        assert transfer.is_throttling_error(e)
+
+
+@pytest.mark.parametrize("n_throttled", [0, 1, 3])
+def test_run_backs_off_when_throttled(n_throttled):
+    registry = ThrottlingRegistry(n_throttled)
+    controller = transfer.AdaptiveConcurrency(initial=16, maximum=32)
+    delays = []
+
+    # Run
+    result = controller.run(
+        registry.transfer, apply_limit=registry.set_limit, sleep=delays.append
+    )
+
+    # Every throttle halves the limit and waits before the next attempt
+    assert result == "done"
+    assert registry.attempts == n_throttled + 1
+    assert len(delays) == n_throttled
+    assert registry.limits == [16 // 2 ** i for i in range(n_throttled + 1)]
+
+    # The successful attempt grows the limit again
+    assert controller.limit == registry.limits[-1] + controller.increase
+
+
+def test_run_gives_up():
+    registry = ThrottlingRegistry(n_throttled=10)
+    controller = transfer.AdaptiveConcurrency(initial=4, max_attempts=3)
+
+    with pytest.raises(ThrottlingError):
+        controller.run(registry.transfer, sleep=lambda delay: None)
+
+    assert registry.attempts == 3
+    assert controller.limit == 1
+
+
+def test_run_does_not_retry_other_errors():
+    controller = transfer.AdaptiveConcurrency()
+
+    def fail():
+        raise ValueError("bad")
+
+    with pytest.raises(ValueError):
+        controller.run(fail, sleep=lambda delay: None)
+
+    assert controller.limit == 10
+
+
+def test_record_success_steps_back_when_throughput_drops():
+    controller = transfer.AdaptiveConcurrency(initial=10, increase=2)
+
+    # Throughput improves, keep growing
+    controller.record_success(100, 1.0)
+    controller.record_success(200, 1.0)
+    assert controller.limit == 14
+
+    # Throughput dropped, step back
+    controller.record_success(50, 1.0)
+    assert controller.limit == 12
+
+
+def test_run_chunked_retries_only_throttled_chunk():
+    controller = transfer.AdaptiveConcurrency(initial=2, maximum=2)
+    chunk_size = 2 * transfer.FILES_PER_REQUEST_SLOT
+    items = list(range(3 * chunk_size))
+    attempted = []
+
+    # The second chunk is throttled once
+    def copy_chunk(chunk):
+        attempted.append(chunk)
+        if len(attempted) == 2:
+            raise ThrottlingError("SlowDown", 503)
+
+        return [item * 10 for item in chunk]
+
+    # Run
+    results = controller.run_chunked(
+        items, copy_chunk, get_size=lambda item: 1, sleep=lambda delay: None
+    )
+
+    # Every item has its result, only the throttled chunk was attempted again
+    assert results == [item * 10 for item in items]
+    assert attempted == [
+        items[:chunk_size],
+        items[chunk_size : 2 * chunk_size],
+        items[chunk_size : 2 * chunk_size],
+        items[2 * chunk_size :],
+    ]
@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import random
+import threading
+import time
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional
+
+###############################################################################
+
+log = logging.getLogger(__name__)
+
+###############################################################################
+
+# Error codes and HTTP statuses that mean the registry is asking us to slow down
+THROTTLING_ERROR_CODES = {
+    "SlowDown",
+    "Throttling",
+    "ThrottlingException",
+    "RequestLimitExceeded",
+    "TooManyRequestsException",
+    "ServiceUnavailable",
+    "503",
+}
+THROTTLING_STATUS_CODES = {429, 503}
+
+# How many files each concurrent request slot gets per chunk of a chunked transfer
+# Large enough to keep every slot busy, small enough that a throttled chunk is cheap
+# to retry
+FILES_PER_REQUEST_SLOT = 4
+
+# One controller per registry so every step transferring to the same registry
+# shares what has been learned about its limits
+_controllers: Dict[str, "AdaptiveConcurrency"] = {}
+_controllers_lock = threading.Lock()
+
+###############################################################################
+
+
+def is_throttling_error(error: BaseException) -> bool:
+    # Errors are inspected by shape rather than type so that any S3 compatible
+    # client (and errors wrapped by quilt) are recognized
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        response = getattr(error, "response", None)
+        if isinstance(response, dict):
+            code = response.get("Error", {}).get("Code")
+            status = response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+            if code in THROTTLING_ERROR_CODES or status in THROTTLING_STATUS_CODES:
+                return True
+
+        error = error.__cause__ or error.__context__
+
+    return False
+
+
+def get_backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    # Exponential backoff with full jitter so that many nodes that were throttled at
+    # the same time don't all retry at the same time
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class AdaptiveConcurrency:
+    """
+    An additive increase, multiplicative decrease (AIMD) concurrency limit.
+
+    The limit grows while transfer throughput keeps improving and is cut whenever
+    the registry throttles requests.
+
+    Parameters
+    ----------
+    initial: int
+        The starting concurrency limit.
+        Default: 10
+    minimum: int
+        The lowest the limit can be cut to.
+        Default: 1
+    maximum: int
+        The highest the limit can grow to.
+        Default: 100
+    increase: int
+        How much the limit grows after a transfer that didn't lose throughput.
+        Default: 2
+    decrease: float
+        The fraction of the limit kept after a transfer was throttled.
+        Default: 0.5
+    max_attempts: int
+        How many times a throttled transfer is attempted before giving up.
+        Default: 5
+    """
+
+    def __init__(
+        self,
+        initial: int = 10,
+        minimum: int = 1,
+        maximum: int = 100,
+        increase: int = 2,
+        decrease: float = 0.5,
+        max_attempts: int = 5,
+    ):
+        if not minimum <= initial <= maximum:
+            raise ValueError(
+                f"Initial concurrency ({initial}) must be between the minimum "
+                f"({minimum}) and maximum ({maximum})."
+            )
+
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.max_attempts = max_attempts
+        self._last_throughput = None
+        self._lock = threading.Lock()
+
+    def record_success(self, n_bytes: Optional[int], seconds: float):
+        """
+        Grow the limit if throughput at the current limit didn't drop.
+        """
+        with self._lock:
+            # Without a size there is no throughput to compare, keep probing upwards
+            throughput = None
+            if n_bytes is not None and seconds > 0:
+                throughput = n_bytes / seconds
+
+            # Throughput dropped, the last increase didn't help, step back
+            if (
+                throughput is not None
+                and self._last_throughput is not None
+                and throughput < self._last_throughput * 0.9
+            ):
+                self.limit = max(self.minimum, self.limit - self.increase)
+            else:
+                self.limit = min(self.maximum, self.limit + self.increase)
+
+            if throughput is not None:
+                self._last_throughput = throughput
+
+    def record_throttle(self):
+        """
+        Cut the limit after the registry throttled a transfer.
+        """
+        with self._lock:
+            self.limit = max(self.minimum, int(self.limit * self.decrease))
+            self._last_throughput = None
+
+    def run(
+        self,
+        transfer: Callable[[], Any],
+        n_bytes: Optional[int] = None,
+        apply_limit: Optional[Callable[[int], None]] = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> Any:
+        """
+        Run a transfer, retrying with jittered backoff and a reduced limit whenever
+        it is throttled.
+
+        Parameters
+        ----------
+        transfer: Callable[[], Any]
+            The transfer to run.
+        n_bytes: Optional[int]
+            The number of bytes the transfer moves, used to measure throughput.
+            Default: None (Unknown)
+        apply_limit: Optional[Callable[[int], None]]
+            Called with the current limit prior to every attempt to configure the
+            underlying transfer client.
+            Default: None (Don't configure anything)
+        sleep: Callable[[float], None]
+            The function used to wait between attempts.
+            Default: time.sleep
+
+        Returns
+        -------
+        result: Any
+            The result of the transfer.
+        """
+        for attempt in range(self.max_attempts):
+            if apply_limit is not None:
+                apply_limit(self.limit)
+
+            start = time.perf_counter()
+            try:
+                result = transfer()
+            except Exception as e:
+                if not is_throttling_error(e) or attempt == self.max_attempts - 1:
+                    raise
+
+                self.record_throttle()
+                delay = get_backoff_delay(attempt)
+                log.warning(
+                    f"Transfer was throttled ({e}). Retrying in {delay:.2f} seconds "
+                    f"with concurrency {self.limit}."
+                )
+                sleep(delay)
+                continue
+
+            self.record_success(n_bytes, time.perf_counter() - start)
+            return result
+
+    def run_chunked(
+        self,
+        items: List[Any],
+        transfer: Callable[[List[Any]], List[Any]],
+        get_size: Optional[Callable[[Any], int]] = None,
+        apply_limit: Optional[Callable[[int], None]] = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> List[Any]:
+        """
+        Run a transfer of many items in chunks, each run and retried on its own.
+
+        Chunks are sized from the current limit so the limit adapts between chunks,
+        and a throttled chunk is retried without repeating the chunks that completed.
+
+        Parameters
+        ----------
+        items: List[Any]
+            The items to transfer. Ex: (source, destination, size) tuples
+        transfer: Callable[[List[Any]], List[Any]]
+            Transfers a chunk of items and returns a result for each item.
+        get_size: Optional[Callable[[Any], int]]
+            Get the number of bytes an item moves, used to measure throughput.
+            Default: None (Unknown)
+        apply_limit: Optional[Callable[[int], None]]
+            Called with the current limit prior to every attempt to configure the
+            underlying transfer client.
+            Default: None (Don't configure anything)
+        sleep: Callable[[float], None]
+            The function used to wait between attempts.
+            Default: time.sleep
+
+        Returns
+        -------
+        results: List[Any]
+            The result of every item, in the same order as the items.
+        """
+        results = []
+        start = 0
+        while start < len(items):
+            chunk = items[start : start + self.limit * FILES_PER_REQUEST_SLOT]
+            n_bytes = None
+            if get_size is not None:
+                n_bytes = sum(get_size(item) for item in chunk)
+
+            results.extend(
+                self.run(
+                    partial(transfer, chunk),
+                    n_bytes=n_bytes,
+                    apply_limit=apply_limit,
+                    sleep=sleep,
+                )
+            )
+            start += len(chunk)
+
+        return results
+
+
+def get_controller(registry: str, config: Dict[str, Any] = {}) -> AdaptiveConcurrency:
+    """
+    Get the shared concurrency controller for a registry.
+
+    Parameters
+    ----------
+    registry: str
+        The registry transfers are made to or from. Ex: "s3://my-bucket"
+    config: Dict[str, Any]
+        Parameters for `AdaptiveConcurrency` used if the controller is created.
+        Ex: {"initial": 8, "maximum": 64}
+        Default: {} (Use the defaults)
+    """
+    with _controllers_lock:
+        if registry not in _controllers:
+            _controllers[registry] = AdaptiveConcurrency(**config)
+
+        return _controllers[registry]
+
+
+def set_quilt_concurrency(limit: int):
+    # quilt reads its concurrency from module level settings every time it starts
+    # copying a list of files
+    from quilt3 import data_transfer
+
+    data_transfer.s3_transfer_config.max_request_concurrency = limit
+    if hasattr(data_transfer, "MAX_CONCURRENCY"):
+        data_transfer.MAX_CONCURRENCY = limit
@@ -19,6 +19,10 @@ test_requirements = [
 
 setup_requirements = ["pytest-runner"]
 
+benchmark_requirements = ["moto", "pytest", "pytest-benchmark>=3.2.0"]
+
+compression_requirements = ["zstandard>=0.13.0"]
+
 dev_requirements = [
     "bumpversion>=0.5.3",
     "coverage>=5.0a4",
@@ -55,12 +59,16 @@ requirements = [
 
 extra_requirements = {
     "test": test_requirements,
+    "benchmark": benchmark_requirements,
+    "compression": compression_requirements,
     "setup": setup_requirements,
     "dev": dev_requirements,
     "interactive": interactive_requirements,
     "all": [
         *requirements,
         *test_requirements,
+        *benchmark_requirements,
+        *compression_requirements,
         *setup_requirements,
         *dev_requirements,
         *interactive_requirements,
@@ -88,7 +96,9 @@ setup(
     include_package_data=True,
     keywords="datastep, DAG, data, stepwise",
     name="datastep",
-    packages=find_packages(exclude=["tests", "*.tests", "*.tests.*"]),
+    packages=find_packages(
+        exclude=["tests", "*.tests", "*.tests.*", "benchmarks", "benchmarks.*"]
+    ),
     python_requires=">=3.6",
     setup_requires=setup_requirements,
     test_suite="datastep/tests",